@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Body, UploadFile, File, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Tuple, Optional
+import asyncio
 import json
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from utils.auth import get_admin_token
 from services.contest_manager import manager
-from services.cf_client import cf_client
+from services.cf_client import cf_client, read_submissions
+from services.poller import poller
+from services.profiler import profiler
+from api.viewport import viewport_params
+from services.contest_archive import iter_archive, ARCHIVE_MEDIA_TYPE
+from services.serialization import FastJSONResponse, TEAM_FIELDS
 
-from domain.models import Node, ContestState
+from domain.models import Node, ContestState, ScoringMode, UnlockRule
 
 router = APIRouter(dependencies=[Depends(get_admin_token)])
 
@@ -16,6 +22,7 @@ class ConfigUpdate(BaseModel):
     start_time: int
     duration: int
     name: Optional[str] = None
+    scoring: Optional[ScoringMode] = None
 
 class StateUpdate(BaseModel):
     state: ContestState
@@ -26,6 +33,9 @@ class NodeModel(BaseModel):
     rating: int
     position: Tuple[int, int]
     neighbors: List[str] = []
+    # Left out by clients that do not edit unlock rules, keeps the current rule
+    unlock: Optional[UnlockRule] = None
+    unlock_count: Optional[int] = Field(default=None, ge=1)
 
 class EdgeModel(BaseModel):
     from_id: str
@@ -35,9 +45,55 @@ class EdgeModel(BaseModel):
 async def get_admin_status():
     return await manager.get_admin_status()
 
+@router.get("/poller")
+async def get_poller_stats():
+    return {"running": poller.running, "stages": poller.get_stats()}
+
+class ProfileRequest(BaseModel):
+    scope: str # "poll", "apply", "save" or "route"
+    route: Optional[str] = None # path prefix for the route scope, e.g. /api/team/me
+    seconds: float = 30
+    cycles: Optional[int] = None # stop after this many scoped runs
+    memory: bool = False # also trace allocations with tracemalloc
+
+@router.post("/profile")
+async def start_profile(req: ProfileRequest):
+    try:
+        profiler.start(req.scope, route=req.route, seconds=req.seconds, cycles=req.cycles, memory=req.memory)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
+
+@router.get("/profile")
+async def get_profile_status():
+    return profiler.status()
+
+@router.delete("/profile")
+async def stop_profile():
+    profiler.stop()
+    return profiler.status()
+
+@router.get("/profile/report")
+async def get_profile_report(top: int = Query(40, ge=1, le=500)):
+    report = profiler.report(top)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No finished profile capture")
+    return report
+
+@router.get("/profile/download")
+async def download_profile():
+    data = profiler.dump()
+    if data is None:
+        raise HTTPException(status_code=404, detail="No finished profile capture with samples")
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": "attachment; filename=graphway.prof"}
+    )
+
 @router.post("/config")
 async def update_config(config: ConfigUpdate):
-    await manager.update_config(config.start_time, config.duration, config.name)
+    await manager.update_config(config.start_time, config.duration, config.name, config.scoring)
     await manager.save_state()
     return {"status": "updated"}
 
@@ -53,8 +109,8 @@ async def set_contest_state(update: StateUpdate):
     return {"status": "updated", "state": update.state}
 
 @router.get("/graph")
-async def get_graph():
-    return await manager.get_graph_data()
+async def get_graph(viewport = Depends(viewport_params)):
+    return FastJSONResponse(await manager.get_graph_data(viewport))
 
 @router.post("/graph/node")
 async def add_update_node(node: NodeModel):
@@ -64,7 +120,8 @@ async def add_update_node(node: NodeModel):
             pid=node.pid,
             rating=node.rating,
             position=node.position,
-            neighbors=set(node.neighbors)
+            neighbors=set(node.neighbors),
+            **node.model_dump(include={"unlock", "unlock_count"}, exclude_none=True)
         )
 
         await manager.add_or_update_node(new_node)
@@ -102,25 +159,47 @@ async def delete_edge(edge: EdgeModel):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/export")
-async def export_contest():
+async def export_contest(format: str = "json"):
+    if format == "archive":
+        # Records are encoded under the lock, compression runs while streaming
+        records = await manager.get_archive_records()
+        return StreamingResponse(
+            iter_archive(records),
+            media_type=ARCHIVE_MEDIA_TYPE,
+            headers={"Content-Disposition": "attachment; filename=contest_export.graphway.gz"}
+        )
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unknown export format '{format}'")
+
     data = await manager.get_contest_state_data()
-    return JSONResponse(
+    return FastJSONResponse(
         content=data,
         headers={"Content-Disposition": "attachment; filename=contest_export.json"}
     )
 
 @router.post("/import")
 async def import_contest(file: UploadFile = File(...)):
+    # Accepts both the plain JSON export and the compressed archive
     try:
-        content = await file.read()
-        data = json.loads(content)
-        await manager.load_contest_from_data(data)
+        await manager.import_contest_file(file.file)
         return {"status": "imported", "message": "Contest state loaded successfully"}
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON file")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/replay")
+async def replay_submissions(file: UploadFile = File(...)):
+    # Catch-up after downtime or a replay: a saved problemset.recentStatus or
+    # user.status response, large batches are applied per team in parallel
+    try:
+        subs = await asyncio.to_thread(read_submissions, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await manager.process_submissions(subs)
+    await manager.save_state()
+    return {"status": "replayed", "submissions": len(subs)}
+
 import uuid
 from domain.models import Team
 
@@ -128,9 +207,35 @@ class TeamCreate(BaseModel):
     name: str
     handles: List[str]
 
+LISTING_PARAMS = {"limit", "cursor", "name", "handle", "min_solved", "max_solved", "fields", "summary"}
+
 @router.get("/teams")
-async def get_teams():
-    return await manager.get_all_teams()
+async def get_teams(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    name: str = "",
+    handle: str = "",
+    min_solved: Optional[int] = Query(None, ge=0),
+    max_solved: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+    summary: bool = False
+):
+    # Without listing parameters keep returning the plain list of full teams,
+    # the admin token may itself arrive as a query parameter
+    if not LISTING_PARAMS & request.query_params.keys():
+        return FastJSONResponse(await manager.get_all_teams())
+
+    projection = None
+    if fields:
+        projection = [f for f in fields.split(",") if f]
+        unknown = [f for f in projection if f not in TEAM_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown team fields: {', '.join(unknown)}")
+    return FastJSONResponse(await manager.list_teams(
+        limit, cursor=cursor, fields=projection, summary=summary,
+        name_prefix=name, handle_prefix=handle, min_solved=min_solved, max_solved=max_solved
+    ))
 
 @router.post("/teams")
 async def add_team(team_data: TeamCreate):
@@ -193,7 +298,7 @@ async def get_team_state(team_id: str):
     state = await manager.get_team_node_states(team_id)
     if state is None:
         raise HTTPException(status_code=404, detail="Team not found")
-    return state
+    return FastJSONResponse(state)
 
 class RandomProblemRequest(BaseModel):
     min_rating: int
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from services.contest_manager import manager
+from services.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -7,4 +8,8 @@ router = APIRouter()
 async def get_leaderboard():
     leaderboard = await manager.get_leaderboard_data()
     leaderboard.sort(key=lambda x: (x["score"], x["solved"]), reverse=True)
-    return leaderboard
+    return FastJSONResponse(leaderboard)
+
+@router.get("/stats")
+async def get_node_stats():
+    return FastJSONResponse(await manager.get_node_stats())
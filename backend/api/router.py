@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 from api import admin_routes, team_routes, public_routes
+from services.contest_manager import manager
 
-api_router = APIRouter()
+async def require_ready():
+    if not manager.ready.is_set():
+        raise HTTPException(status_code=503, detail="Contest is still loading", headers={"Retry-After": "1"})
+
+api_router = APIRouter(dependencies=[Depends(require_ready)])
 
 api_router.include_router(admin_routes.router, prefix="/admin", tags=["admin"])
 api_router.include_router(team_routes.router, prefix="/team", tags=["team"])
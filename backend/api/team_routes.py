@@ -1,16 +1,44 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from services.contest_manager import manager
 from domain.models import Team
+from services.serialization import FastJSONResponse
+from api.viewport import viewport_params
 
 router = APIRouter()
 
 @router.get("/me/{token}")
-async def get_team_view(token: str):
-    view = await manager.get_team_view(token)
+async def get_team_view(token: str, viewport = Depends(viewport_params)):
+    view = await manager.get_team_view(token, viewport)
     
     if not view:
         raise HTTPException(status_code=404, detail="Team not found")
         
-    return view
+    return FastJSONResponse(view)
+
+
+@router.get("/me/{token}/state")
+async def get_team_state(token: str, since: Optional[str] = None, format: str = "changes"):
+    # Poll with the returned version as `since` to receive only changed nodes
+    if format not in ("changes", "bitmask"):
+        raise HTTPException(status_code=400, detail=f"Unknown state format '{format}'")
+
+    state = await manager.get_team_state(token, since, as_bitmask=(format == "bitmask"))
+    if not state:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    return FastJSONResponse(state)
+
+@router.get("/topology/{digest}")
+async def get_topology(digest: str):
+    current, body = await manager.get_topology()
+    if digest != current:
+        raise HTTPException(status_code=404, detail="Topology has changed")
+
+    # The digest is part of the URL, so the content never changes
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{digest}"'}
+    )
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from fastapi import HTTPException, Query
+
+LODS = ("full", "compact", "cluster")
+UNBOUNDED = 2 ** 62
+
+@dataclass
+class Viewport:
+    bbox: Tuple[int, int, int, int] # (x0, y0, x1, y1), inclusive
+    lod: str # "full", "compact" (positions, states and edges only) or "cluster"
+    cluster_size: int # bucket size for "cluster"
+
+def viewport_params(
+    x0: Optional[int] = None,
+    y0: Optional[int] = None,
+    x1: Optional[int] = None,
+    y1: Optional[int] = None,
+    lod: str = "full",
+    cluster: int = Query(1024, ge=1)
+) -> Optional[Viewport]:
+    """Optional bounding box and level of detail, None for the whole graph in full detail"""
+    if lod not in LODS:
+        raise HTTPException(status_code=400, detail=f"Unknown level of detail '{lod}'")
+    coords = (x0, y0, x1, y1)
+    if all(c is None for c in coords):
+        if lod == "full":
+            return None
+        coords = (-UNBOUNDED, -UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    elif any(c is None for c in coords):
+        raise HTTPException(status_code=400, detail="Bounding box needs x0, y0, x1 and y1")
+    return Viewport(bbox=coords, lod=lod, cluster_size=cluster)
@@ -0,0 +1,108 @@
+"""Compare the model_dump paths with the serialization layer.
+
+Besides the original json.dumps(indent=2) save, the plain pydantic and orjson
+encoders are measured so the layer is compared against the fast baselines.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization --nodes 2000 --teams 500
+"""
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+
+from domain.models import Contest, Team, Node
+from services.serialization import dump_contest, dumps, orjson, team_data
+
+
+def build_contest(n_nodes: int, n_teams: int, seed: int = 0) -> Contest:
+    rng = random.Random(seed)
+    nodes = {}
+    for i in range(n_nodes):
+        neighbors = {f"n{j}" for j in rng.sample(range(i + 1, n_nodes), min(3, n_nodes - i - 1))}
+        nodes[f"n{i}"] = Node(id=f"n{i}", pid=f"{1000 + i}/A", rating=800 + 100 * (i % 20),
+                              position=(i * 10, rng.randint(0, 1000)), neighbors=neighbors)
+    ids = list(nodes)
+    teams = []
+    for i in range(n_teams):
+        solved = set(rng.sample(ids, min(len(ids), rng.randint(0, 50))))
+        teams.append(Team(id=f"t{i}", name=f"Team {i}", cf_handles=[f"handle{i}"],
+                          solved=solved, available=set(rng.sample(ids, min(len(ids), 10))) - solved))
+    return Contest(name="Benchmark", nodes=nodes, teams=teams)
+
+
+def legacy_save(contest: Contest) -> bytes:
+    return json.dumps(contest.model_dump(mode="json"), indent=2).encode("utf-8")
+
+
+def orjson_save(contest: Contest) -> bytes:
+    return orjson.dumps(contest.model_dump(mode="json"))
+
+
+def pydantic_save(contest: Contest) -> bytes:
+    return contest.model_dump_json().encode("utf-8")
+
+
+def legacy_teams(contest: Contest) -> bytes:
+    # Dict building in the manager followed by FastAPI's generic encoder
+    from fastapi.encoders import jsonable_encoder
+    data = [
+        {
+            "id": t.id,
+            "name": t.name,
+            "cf_handles": t.cf_handles,
+            "solved": list(t.solved),
+            "available": list(t.available),
+            "access_code": t.access_code
+        }
+        for t in contest.teams
+    ]
+    return json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+
+
+def fast_teams(contest: Contest) -> bytes:
+    return dumps([team_data(t) for t in contest.teams])
+
+
+def orjson_teams(contest: Contest) -> bytes:
+    return orjson.dumps([t.model_dump(mode="json") for t in contest.teams])
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(label: str, fn, number: int) -> None:
+    best = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    peak = peak_memory(fn) / 2**20
+    print(f"{label:<28} {best * 1000:9.2f} ms  {peak:7.1f} MiB peak  ({len(fn())} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--teams", type=int, default=500)
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    contest = build_contest(args.nodes, args.teams)
+    print(f"{args.nodes} nodes, {args.teams} teams")
+    bench("save: model_dump + json", lambda: legacy_save(contest), args.number)
+    bench("save: model_dump_json", lambda: pydantic_save(contest), args.number)
+    if orjson is not None:
+        bench("save: model_dump + orjson", lambda: orjson_save(contest), args.number)
+    bench("save: dump_contest", lambda: dump_contest(contest), args.number)
+    bench("teams: jsonable_encoder", lambda: legacy_teams(contest), args.number)
+    if orjson is not None:
+        bench("teams: model_dump + orjson", lambda: orjson_teams(contest), args.number)
+    bench("teams: team_data + dumps", lambda: fast_teams(contest), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Load test the backend with simulated team clients and a mock Codeforces API.
+
+Registers N teams through the admin API, serves accepted submissions for
+their handles from a local mock of the Codeforces API, and has every team
+poll /team/me/{token} and /public/leaderboard. Reports latency percentiles,
+throughput and error rate per endpoint.
+
+Either point it at a running backend that was started with
+CF_API_URL=http://127.0.0.1:<cf-port>/api, or let it spawn one:
+    python -m benchmarks.load_test --spawn --teams 300 --duration 60
+
+The contest on the target backend is reset. Requires httpx
+(benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MockCodeforces:
+    """Minimal HTTP server for problemset.recentStatus and problemset.problems"""
+
+    def __init__(self, pids: List[str], handles: List[str], solves_per_second: float, wrong_ratio: float = 0.3):
+        self.pids = pids
+        self.handles = handles
+        self.solves_per_second = solves_per_second
+        self.wrong_ratio = wrong_ratio
+        self.progress = {h: 0 for h in handles}
+        self.submissions: List[dict] = []
+        self.next_id = 1
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.generator: Optional[asyncio.Task] = None
+
+    async def start(self, host: str, port: int):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.generator = asyncio.create_task(self._generate())
+
+    async def stop(self):
+        self.generator.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _submission(self, handle: str) -> dict:
+        idx = self.progress[handle]
+        verdict = "WRONG_ANSWER" if random.random() < self.wrong_ratio else "OK"
+        if verdict == "OK" and idx < len(self.pids) - 1:
+            self.progress[handle] = idx + 1
+        contest_id, index = self.pids[idx].split("/")
+        sub = {
+            "id": self.next_id,
+            "creationTimeSeconds": int(time.time()),
+            "problem": {"contestId": int(contest_id), "index": index},
+            "author": {"members": [{"handle": handle}]},
+            "verdict": verdict,
+        }
+        self.next_id += 1
+        return sub
+
+    async def _generate(self):
+        # Emit submissions in small ticks so they spread over the poll window
+        tick = 0.1
+        budget = 0.0
+        while True:
+            await asyncio.sleep(tick)
+            budget += self.solves_per_second * tick
+            while budget >= 1:
+                budget -= 1
+                self.submissions.append(self._submission(random.choice(self.handles)))
+            # recentStatus never returns more than 1000 entries
+            if len(self.submissions) > 2000:
+                del self.submissions[:-1000]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            _, target, _ = request_line.decode().split(" ", 2)
+            url = urlsplit(target)
+            if url.path.endswith("/problemset.recentStatus"):
+                count = int(parse_qs(url.query).get("count", ["1000"])[0])
+                result = self.submissions[-count:][::-1]
+            elif url.path.endswith("/problemset.problems"):
+                result = {"problems": [
+                    {"contestId": int(p.split("/")[0]), "index": p.split("/")[1], "name": p, "rating": 800}
+                    for p in self.pids
+                ]}
+            else:
+                result = None
+            body = json.dumps({"status": "OK", "result": result} if result is not None
+                              else {"status": "FAILED", "comment": "not found"}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        self.latencies[endpoint].append(latency)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float):
+        print(f"{'endpoint':<22}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            qs = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+            error_rate = self.errors[endpoint] / len(values)
+            print(f"{endpoint:<22}{len(values):>8}{len(values) / elapsed:>9.1f}"
+                  f"{qs[49] * 1000:>9.1f}{qs[94] * 1000:>9.1f}{qs[98] * 1000:>9.1f}{error_rate:>8.1%}")
+
+
+def build_graph(n_nodes: int, width: int) -> List[dict]:
+    """Layered graph where every node unlocks two nodes of the next layer"""
+    nodes = []
+    for i in range(n_nodes):
+        layer, col = divmod(i, width)
+        neighbors = []
+        for nc in (col, (col + 1) % width):
+            j = (layer + 1) * width + nc
+            if j < n_nodes and f"n{j}" not in neighbors:
+                neighbors.append(f"n{j}")
+        nodes.append({
+            "id": f"n{i}",
+            "pid": f"{100000 + i}/A",
+            "rating": 800,
+            "position": [layer * 200, col * 120],
+            "neighbors": neighbors,
+        })
+    return nodes
+
+
+async def setup_contest(client: httpx.AsyncClient, admin: dict, nodes: List[dict], handles: List[str]) -> List[str]:
+    """Reset the contest, build the graph and teams, and start it"""
+    (await client.post("/api/admin/reset", headers=admin)).raise_for_status()
+    for node in nodes:
+        (await client.post("/api/admin/graph/node", json=node, headers=admin)).raise_for_status()
+    tokens = []
+    for i, handle in enumerate(handles):
+        resp = await client.post("/api/admin/teams", json={"name": f"Load Team {i}", "handles": [handle]}, headers=admin)
+        resp.raise_for_status()
+        tokens.append(resp.json()["access_code"])
+    config = {"start_time": int(time.time()) - 60, "duration": 24 * 3600, "name": "Load Test"}
+    (await client.post("/api/admin/config", json=config, headers=admin)).raise_for_status()
+    (await client.post("/api/admin/contest/state", json={"state": "RUNNING"}, headers=admin)).raise_for_status()
+    return tokens
+
+
+async def timed_get(client: httpx.AsyncClient, stats: Stats, endpoint: str, url: str):
+    start = time.perf_counter()
+    try:
+        resp = await client.get(url)
+        ok = resp.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    stats.record(endpoint, time.perf_counter() - start, ok)
+
+
+async def team_client(client: httpx.AsyncClient, stats: Stats, token: str, args, deadline: float):
+    # Random phase so that clients do not poll in lockstep
+    await asyncio.sleep(random.uniform(0, args.team_interval))
+    next_leaderboard = time.monotonic() + random.uniform(0, args.leaderboard_interval)
+    while time.monotonic() < deadline:
+        await timed_get(client, stats, "/team/me/{token}", f"/api/team/me/{token}")
+        if time.monotonic() >= next_leaderboard:
+            await timed_get(client, stats, "/public/leaderboard", "/api/public/leaderboard")
+            next_leaderboard += args.leaderboard_interval
+        await asyncio.sleep(args.team_interval * random.uniform(0.9, 1.1))
+
+
+def spawn_backend(args) -> subprocess.Popen:
+    env = dict(os.environ, CF_API_URL=f"http://127.0.0.1:{args.cf_port}/api", ADMIN_TOKEN=args.admin_token)
+    workdir = tempfile.mkdtemp(prefix="graphway-load-")
+    port = urlsplit(args.base_url).port or 8000
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Backend did not become ready")
+
+
+async def run(args):
+    handles = [f"load_handle_{i}" for i in range(args.teams)]
+    nodes = build_graph(args.nodes, args.width)
+    mock = MockCodeforces([n["pid"] for n in nodes], handles, args.solves_per_second)
+    await mock.start("127.0.0.1", args.cf_port)
+
+    backend = spawn_backend(args) if args.spawn else None
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    try:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_ready(client)
+            print(f"Setting up {args.nodes} nodes and {args.teams} teams...")
+            tokens = await setup_contest(client, {"X-Admin-Token": args.admin_token}, nodes, handles)
+
+            print(f"Running {len(tokens)} team clients for {args.duration}s...")
+            stats = Stats()
+            start = time.monotonic()
+            deadline = start + args.duration
+            await asyncio.gather(*(team_client(client, stats, t, args, deadline) for t in tokens))
+            stats.report(time.monotonic() - start)
+    finally:
+        await mock.stop()
+        if backend:
+            backend.terminate()
+            backend.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN", "load-test-token"))
+    parser.add_argument("--spawn", action="store_true", help="start a backend subprocess wired to the mock")
+    parser.add_argument("--cf-port", type=int, default=8099)
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--width", type=int, default=10, help="nodes per graph layer")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--team-interval", type=float, default=10, help="seconds between /team/me polls")
+    parser.add_argument("--leaderboard-interval", type=float, default=10)
+    parser.add_argument("--solves-per-second", type=float, default=20)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,64 @@
-from typing import Optional, Set
-from domain.models import Contest, Team, Node
+import bisect
+import heapq
+import secrets
+import time
+from collections import deque
+from typing import Optional, Set, List, Dict
+from domain.models import Contest, Team, Node, ScoringMode, UnlockRule
+from domain.spatial_index import GridIndex
+
+def parse_submission(sub, handle_team, pid_node, start_time: int, end_time: int):
+    """(team, node, time) of an accepted in-contest submission on a graph problem, else None"""
+    try:
+        verdict = sub.get("verdict")
+        if verdict != "OK":
+            return None
+        team = handle_team.get(sub["author"]["members"][0]["handle"])
+        if team is None:
+            return None
+
+        problem = sub["problem"]
+        node = pid_node.get(f"{problem['contestId']}/{problem['index']}")
+        time = int(sub["creationTimeSeconds"])
+
+        if not node:
+            return None
+        if time < start_time or time > end_time:
+            return None
+        return team, node, time
+
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+def resolve_solves(neighbors, required, teams) -> List[tuple]:
+    """Replay each team's events against its own state
+
+    Teams are independent, so this only needs the graph and the team's solved,
+    available and prerequisite counters. Returns the events that become solves
+    with the team's final available nodes and counters. Top level so that it
+    can run in a worker process.
+    """
+    results = []
+    for team_id, solved, available, satisfied, events in teams:
+        solved = set(solved)
+        available = set(available)
+        satisfied = dict(satisfied)
+        accepted = []
+        for index, node_id, solved_at in events:
+            if node_id not in available:
+                continue
+            solved.add(node_id)
+            available.discard(node_id)
+            accepted.append((index, node_id, solved_at))
+            for nb in neighbors[node_id]:
+                if nb not in required:
+                    continue
+                count = satisfied.get(nb, 0) + 1
+                satisfied[nb] = count
+                if count >= required[nb] and nb not in solved:
+                    available.add(nb)
+        results.append((team_id, accepted, available, satisfied))
+    return results
 
 class ContestLogic:
     def __init__(self):
@@ -8,6 +67,26 @@ class ContestLogic:
         self.pid_to_node = dict()
         self.handles = set()
         self.handle_to_team = dict()
+        self.team_names = [] # sorted (team name, team id)
+        self.team_handles = [] # sorted (handle, team id)
+        self.teams_by_id = dict()
+        self.solved_index = dict() # solved count -> team ids
+        self.spatial = GridIndex() # node positions
+        self.predecessors = dict()
+        self.required = dict() # node id -> solved prerequisites needed to unlock it
+        self.satisfied = dict() # team id -> {node id: solved prerequisites}
+        self.topo_index = dict() # node id -> position in a topological order
+        self.depth = dict() # node id -> longest path from a starting node
+        self.cyclic = False # only possible for contests saved before cycles were rejected
+        self.team_scores = dict() # team id -> depth based score
+        self.graph_version = 0 # bumped whenever the topology changes
+        self.version = 0 # bumped whenever some team node state changes
+        self.epoch = secrets.token_hex(4) # versions only compare within one epoch, a cold load starts a new one
+        self.base_version = 0 # oldest version that change logs can answer from
+        self.team_changes = dict() # team id -> {node id: version}, oldest first
+        self.solve_counts = dict() # node id -> number of teams that solved it
+        self.available_counts = dict() # node id -> number of teams it is available to
+        self.first_solves = dict() # node id -> (team id, time) of the earliest timed solve
 
     # Graph modification
 
@@ -16,14 +95,27 @@ class ContestLogic:
         self._assert_pid_free(node.pid)
         # Create a clean copy with copied neighbors set to avoid reference issues
         clean = node.model_copy(update={"neighbors": set(node.neighbors or set())})
+        was_cyclic = self.cyclic
         self.contest.nodes[node.id] = clean
         self.update_graph()
+        if self.cyclic and not was_cyclic:
+            del self.contest.nodes[node.id]
+            self.update_graph()
+            raise ValueError("Adding this node would create a cycle.")
+        self.spatial.insert(node.id, clean.position)
 
     def update_node(self, node: Node):
         self._assert_node_exists(node.id)
         self._assert_pid_free(node.pid, except_node_id=node.id)
+        was_cyclic = self.cyclic
+        previous = self.contest.nodes[node.id]
         self.contest.nodes[node.id] = node
         self.update_graph()
+        if self.cyclic and not was_cyclic:
+            self.contest.nodes[node.id] = previous
+            self.update_graph()
+            raise ValueError("Updating this node would create a cycle.")
+        self.spatial.move(node.id, node.position)
 
     def delete_node(self, node_id: str):
         self._assert_node_exists(node_id)
@@ -36,6 +128,9 @@ class ContestLogic:
             for team in self.contest.teams:
                 if node_id in team.solved:
                     team.solved.remove(node_id)
+                team.solve_times.pop(node_id, None)
+            self.spatial.remove(node_id)
+            self._rebuild_solved_index()
 
         self.update_graph()
 
@@ -43,8 +138,28 @@ class ContestLogic:
         self._assert_node_exists(from_node_id)
         self._assert_node_exists(to_node_id)
         self._assert_no_self_loop(from_node_id, to_node_id)
+        if to_node_id in self.contest.nodes[from_node_id].neighbors:
+            return
+
+        if self.cyclic:
+            # The order is not topological, so fall back to a full search and rebuild
+            if from_node_id in self._search(to_node_id, forward=True):
+                raise ValueError("Edge would create a cycle.")
+            self.contest.nodes[from_node_id].neighbors.add(to_node_id)
+            self.update_graph()
+            return
+
+        self._insert_topological_edge(from_node_id, to_node_id)
         self.contest.nodes[from_node_id].neighbors.add(to_node_id)
-        self.update_graph()
+        self.predecessors[to_node_id].add(from_node_id)
+        self.required[to_node_id] = self._required_count(to_node_id)
+        self.starting_nodes.discard(to_node_id)
+        deepened = self._propagate_depth(from_node_id, to_node_id)
+        # Only the target's requirement changed, the rest of every team's state still holds
+        self._refresh_edge_target(from_node_id, to_node_id)
+        if deepened:
+            self._raise_scores(deepened)
+        self._reset_changes()
 
     def delete_edge(self, from_node_id: str, to_node_id: str):
         self._assert_node_exists(from_node_id)
@@ -58,6 +173,7 @@ class ContestLogic:
     def load_contest(self, contest: Contest) -> None:
         """Load existing contest"""
         self.contest = contest
+        self.spatial.rebuild((nid, node.position) for nid, node in contest.nodes.items())
         self.update_graph()
         self.update_handles()
 
@@ -76,7 +192,9 @@ class ContestLogic:
                 raise ValueError(f"Handle {handle} is already taken by another team.")
         self.contest.teams.append(team)
         self.update_handles()
+        self._update_solve_stats(team, team.solved, 1)
         self.recompute_available_for_team(team)
+        self.recompute_team_score(team)
 
     def update_team(self, team_id: str, name: str = None, handles: list[str] = None) -> None:
         """Update team details"""
@@ -88,6 +206,7 @@ class ContestLogic:
             if name != team.name and name in [t.name for t in self.contest.teams]:
                 raise ValueError(f"Team name {name} already exists")
             team.name = name
+            self.update_handles()
             
         if handles is not None:
             # Remove duplicates
@@ -102,7 +221,14 @@ class ContestLogic:
 
     def delete_team(self, team_id: str) -> None:
         """Remove team from the contest"""
+        team = next((t for t in self.contest.teams if t.id == team_id), None)
+        if team:
+            self._update_solve_stats(team, team.solved, -1)
+            self._update_available_stats(team.available, -1)
         self.contest.teams = [t for t in self.contest.teams if t.id != team_id]
+        self.team_scores.pop(team_id, None)
+        self.team_changes.pop(team_id, None)
+        self.satisfied.pop(team_id, None)
         self.update_handles()
 
     # Helpers
@@ -111,25 +237,40 @@ class ContestLogic:
         """Update graph structures"""
         self.starting_nodes = set()
         self.pid_to_node = dict()
+        self.predecessors = dict()
+        self.required = dict()
         if not self.contest:
+            self.topo_index = dict()
+            self.depth = dict()
+            self.cyclic = False
+            self._reset_changes()
             return
             
-        indeg = {nid: 0 for nid in self.contest.nodes.keys()}
+        self.predecessors = {nid: set() for nid in self.contest.nodes.keys()}
         for node in self.contest.nodes.values():
             for nb in node.neighbors:
-                if nb in indeg:
-                    indeg[nb] += 1
-        self.starting_nodes = {nid for nid, d in indeg.items() if d == 0}
+                if nb in self.predecessors:
+                    self.predecessors[nb].add(node.id)
+        self.starting_nodes = {nid for nid, preds in self.predecessors.items() if not preds}
+        self.required = {nid: self._required_count(nid) for nid in self.predecessors}
         for node in self.contest.nodes.values():
             if(node.pid):
                 self.pid_to_node[node.pid] = node
-        
+
+        order = self._rebuild_topological_order()
+        self._recompute_depths(order)
         self.recompute_all_available()
+        self.recompute_all_scores()
+        self.recompute_node_stats()
+        self._reset_changes()
 
     def update_handles(self) -> None:
-        """Update structures containing handles"""
+        """Update structures containing handles and team names"""
         self.handles = set()
         self.handle_to_team = dict()
+        self.team_names = []
+        self.team_handles = []
+        self.teams_by_id = dict()
         if not self.contest:
             return
 
@@ -137,15 +278,94 @@ class ContestLogic:
             for handle in team.cf_handles:
                 self.handles.add(handle)
                 self.handle_to_team[handle] = team
+        self.teams_by_id = {team.id: team for team in self.contest.teams}
+        self.team_names = sorted((team.name, team.id) for team in self.contest.teams)
+        self.team_handles = sorted((handle, team.id) for handle, team in self.handle_to_team.items())
+        self._rebuild_solved_index()
+
+    def _rebuild_solved_index(self) -> None:
+        self.solved_index = dict()
+        for team in self.contest.teams:
+            self.solved_index.setdefault(len(team.solved), set()).add(team.id)
+
+    def _move_solved_count(self, team_id: str, old: int, new: int) -> None:
+        if old == new:
+            return
+        bucket = self.solved_index.get(old)
+        if bucket is not None:
+            bucket.discard(team_id)
+            if not bucket:
+                del self.solved_index[old]
+        self.solved_index.setdefault(new, set()).add(team_id)
+
+    def find_teams(self, name_prefix: str = "", handle_prefix: str = "", after: str = None,
+                   min_solved: int = None, max_solved: int = None):
+        """Teams matching the filters in name order, starting after the team named after"""
+        ids = None
+        if handle_prefix:
+            ids = set()
+            for i in range(bisect.bisect_left(self.team_handles, (handle_prefix,)), len(self.team_handles)):
+                handle, team_id = self.team_handles[i]
+                if not handle.startswith(handle_prefix):
+                    break
+                ids.add(team_id)
+        if min_solved is not None or max_solved is not None:
+            counted = self._teams_in_solved_range(min_solved, max_solved)
+            ids = counted if ids is None else ids & counted
+        names = self.team_names if ids is None else sorted((self.teams_by_id[i].name, i) for i in ids)
+
+        if after is not None and after >= name_prefix:
+            # Names are unique, skip every entry up to and including after
+            lo = bisect.bisect_right(names, (after, chr(0x10FFFF)))
+        else:
+            lo = bisect.bisect_left(names, (name_prefix,))
+        for i in range(lo, len(names)):
+            name, team_id = names[i]
+            if not name.startswith(name_prefix):
+                break
+            yield self.teams_by_id[team_id]
+
+    def _teams_in_solved_range(self, min_solved: int = None, max_solved: int = None) -> Set[str]:
+        """Union of solved count buckets, there are at most one per node count"""
+        ids = set()
+        for count, bucket in self.solved_index.items():
+            if (min_solved is None or count >= min_solved) and (max_solved is None or count <= max_solved):
+                ids |= bucket
+        return ids
+
+    def count_teams(self, name_prefix: str = "", handle_prefix: str = "",
+                    min_solved: int = None, max_solved: int = None) -> Dict[int, int]:
+        """Matching teams per solved count"""
+        if name_prefix or handle_prefix:
+            histogram = dict()
+            for team in self.find_teams(name_prefix, handle_prefix, None, min_solved, max_solved):
+                histogram[len(team.solved)] = histogram.get(len(team.solved), 0) + 1
+            return histogram
+        # Straight from the index, no team is visited
+        return {
+            count: len(bucket) for count, bucket in self.solved_index.items()
+            if (min_solved is None or count >= min_solved) and (max_solved is None or count <= max_solved)
+        }
 
     def recompute_available_for_team(self, team: Team) -> None:
-        """Recompute available nodes for specific team"""
-        unlocked = set(self.starting_nodes)
+        """Recompute prerequisite counters and available nodes for specific team"""
+        satisfied = dict()
         for solved_id in team.solved:
             node = self.contest.nodes.get(solved_id)
             if node:
-                unlocked |= node.neighbors
-        team.available = unlocked - team.solved
+                for nb in node.neighbors:
+                    if nb in self.required:
+                        satisfied[nb] = satisfied.get(nb, 0) + 1
+        self.satisfied[team.id] = satisfied
+
+        unlocked = set(self.starting_nodes)
+        unlocked.update(nid for nid, count in satisfied.items() if count >= self.required[nid])
+        available = unlocked - team.solved
+        changed = team.available ^ available
+        self._update_available_stats(team.available - available, -1)
+        self._update_available_stats(available - team.available, 1)
+        team.available = available
+        self._record_changes(team, changed)
 
     def recompute_all_available(self) -> None:
         """Recompute available nodes for each team"""
@@ -154,10 +374,27 @@ class ContestLogic:
         for team in self.contest.teams:
             self.recompute_available_for_team(team)
 
+    def recompute_team_score(self, team: Team) -> None:
+        """Recompute depth based score for specific team"""
+        self.team_scores[team.id] = max(
+            (self.depth[nid] + 1 for nid in team.solved if nid in self.depth),
+            default=0
+        )
+
+    def recompute_all_scores(self) -> None:
+        """Recompute depth based score for each team"""
+        self.team_scores = dict()
+        if not self.contest:
+            return
+        for team in self.contest.teams:
+            self.recompute_team_score(team)
+
     def get_team_progress(self, team_id: str):
         """Return the distance to the farthest solved node"""
         if not self.contest or not self.contest.nodes:
             return 0
+        if self.contest.scoring == ScoringMode.DEPTH:
+            return self.team_scores.get(team_id, 0)
             
         lowest = 1000000
         for node in self.contest.nodes.values():
@@ -178,32 +415,15 @@ class ContestLogic:
 
     def process_submission(self, sub) -> None:
         """Take any submission and update team solved accordingly"""
-        try:
-            verdict = sub.get("verdict")
-            if verdict != "OK":
-                return
-            handle = sub["author"]["members"][0]["handle"]
-            if handle not in self.handles:
-                return
-
-            problem = sub["problem"]
-            team = self.handle_to_team[handle]
-            pid = f"{problem['contestId']}/{problem['index']}"
-            time = int(sub["creationTimeSeconds"])
-            node = self.pid_to_node.get(pid)
-
-            if not node:
-                return
-            if node.id not in team.available:
-                return
-            if time < self.contest.start_time or time > self.contest.start_time + self.contest.duration:
-                return
-            
-            team.solved.add(node.id)
-            self.recompute_available_for_team(team)
-
-        except (KeyError, IndexError, TypeError):
+        parsed = parse_submission(sub, self.handle_to_team, self.pid_to_node,
+                                  self.contest.start_time, self.contest.start_time + self.contest.duration)
+        if not parsed:
+            return
+        team, node, time = parsed
+        if node.id not in team.available:
             return
+        if self._mark_solved(team, node.id, time):
+            self._propagate_solve(team, node.id)
 
 
     def update_state(self, submissions) -> None:
@@ -213,6 +433,69 @@ class ContestLogic:
         for sub in submissions:
             self.process_submission(sub)
 
+    # Partitioned batch application, see update_state for the serial path
+
+    def resolve_jobs(self, submissions, parts: int) -> List[tuple]:
+        """Partition a batch by team into at most parts resolve_solves jobs"""
+        start_time = self.contest.start_time
+        end_time = start_time + self.contest.duration
+        teams = dict()
+        events = dict() # team id -> [(index, node id, time)]
+        for index, sub in enumerate(submissions):
+            parsed = parse_submission(sub, self.handle_to_team, self.pid_to_node, start_time, end_time)
+            if parsed:
+                team, node, time = parsed
+                teams[team.id] = team
+                events.setdefault(team.id, []).append((index, node.id, time))
+
+        # Workers get compact events only, shipping raw submissions costs more than parsing them
+        slices = [
+            (team_id, teams[team_id].solved, teams[team_id].available, self.satisfied.get(team_id, {}), team_events)
+            for team_id, team_events in events.items()
+        ]
+        if not slices:
+            return []
+        neighbors = {nid: tuple(node.neighbors) for nid, node in self.contest.nodes.items()}
+        # Deal out busiest teams first so parts get similar amounts of work
+        slices.sort(key=lambda s: len(s[4]), reverse=True)
+        parts = max(1, min(parts, len(slices)))
+        return [(neighbors, self.required, slices[i::parts]) for i in range(parts)]
+
+    def apply_solves(self, results: List[List[tuple]]) -> None:
+        """Commit resolve_solves results, one change log entry per team"""
+        teams = {team.id: team for team in self.contest.teams}
+        batch_first = dict() # node id -> (time, submission index, team id)
+        for part in results:
+            for team_id, accepted, available, satisfied in part:
+                team = teams[team_id]
+                solved = [node_id for _, node_id, _ in accepted]
+                before = len(team.solved)
+                team.solved.update(solved)
+                self._move_solved_count(team_id, before, len(team.solved))
+                team.solve_times.update((node_id, solved_at) for _, node_id, solved_at in accepted)
+                for index, node_id, solved_at in accepted:
+                    self.solve_counts[node_id] = self.solve_counts.get(node_id, 0) + 1
+                    first = batch_first.get(node_id)
+                    if first is None or (solved_at, index) < first[:2]:
+                        batch_first[node_id] = (solved_at, index, team_id)
+
+                changed = team.available ^ available
+                changed.update(solved)
+                self._update_available_stats(team.available - available, -1)
+                self._update_available_stats(available - team.available, 1)
+                team.available = available
+                self.satisfied[team_id] = satisfied
+                self._record_changes(team, changed)
+                score = max((self.depth.get(node_id, 0) + 1 for node_id in solved), default=0)
+                if score > self.team_scores.get(team_id, 0):
+                    self.team_scores[team_id] = score
+
+        # Earlier first solves win ties, as they would in update_state
+        for node_id, (solved_at, _, team_id) in batch_first.items():
+            first = self.first_solves.get(node_id)
+            if first is None or solved_at < first[1]:
+                self.first_solves[node_id] = (team_id, solved_at)
+
     def force_solve_node(self, team_id: str, node_id: str):
         """Manually mark a node as solved for a team"""
         if not self.contest:
@@ -225,8 +508,8 @@ class ContestLogic:
         self._assert_node_exists(node_id)
         
         # Add to solved
-        team.solved.add(node_id)
-        self.recompute_available_for_team(team)
+        if self._mark_solved(team, node_id, int(time.time())):
+            self._propagate_solve(team, node_id)
 
     def force_unsolve_node(self, team_id: str, node_id: str):
         """Manually remove a node from solved for a team"""
@@ -242,7 +525,283 @@ class ContestLogic:
         # Remove from solved
         if node_id in team.solved:
             team.solved.remove(node_id)
-            self.recompute_available_for_team(team)
+            self._move_solved_count(team.id, len(team.solved) + 1, len(team.solved))
+            self._update_solve_stats(team, (node_id,), -1)
+            team.solve_times.pop(node_id, None)
+            self._record_changes(team, (node_id,))
+            self._propagate_unsolve(team, node_id)
+            self.recompute_team_score(team)
+
+    def _mark_solved(self, team: Team, node_id: str, solved_at: int) -> bool:
+        """Add node to team solved and bump its score and stats in O(1)"""
+        if node_id in team.solved:
+            return False
+        team.solved.add(node_id)
+        team.solve_times[node_id] = solved_at
+        self._move_solved_count(team.id, len(team.solved) - 1, len(team.solved))
+        self._update_solve_stats(team, (node_id,), 1)
+        self._record_changes(team, (node_id,))
+        score = self.depth.get(node_id, 0) + 1
+        if score > self.team_scores.get(team.id, 0):
+            self.team_scores[team.id] = score
+        return True
+
+    # Unlocking
+
+    def _required_count(self, node_id: str) -> int:
+        """Solved prerequisites needed to unlock node, 0 for starting nodes"""
+        indeg = len(self.predecessors[node_id])
+        if indeg == 0:
+            return 0
+        node = self.contest.nodes[node_id]
+        if node.unlock == UnlockRule.ALL:
+            return indeg
+        if node.unlock == UnlockRule.THRESHOLD:
+            return min(node.unlock_count, indeg)
+        return 1
+
+    def _propagate_solve(self, team: Team, node_id: str) -> None:
+        """Update counters and available nodes after a solve in O(out-degree)"""
+        satisfied = self.satisfied.setdefault(team.id, dict())
+        if node_id in team.available:
+            team.available.discard(node_id)
+            self._update_available_stats((node_id,), -1)
+
+        unlocked = []
+        for nb in self.contest.nodes[node_id].neighbors:
+            if nb not in self.required:
+                continue
+            count = satisfied.get(nb, 0) + 1
+            satisfied[nb] = count
+            if count >= self.required[nb] and nb not in team.solved and nb not in team.available:
+                team.available.add(nb)
+                unlocked.append(nb)
+        self._update_available_stats(unlocked, 1)
+        self._record_changes(team, unlocked)
+
+    def _propagate_unsolve(self, team: Team, node_id: str) -> None:
+        """Update counters and available nodes after an unsolve in O(out-degree)"""
+        satisfied = self.satisfied.setdefault(team.id, dict())
+        locked = []
+        for nb in self.contest.nodes[node_id].neighbors:
+            if nb not in self.required:
+                continue
+            count = satisfied.get(nb, 0) - 1
+            satisfied[nb] = count
+            if count < self.required[nb] and nb in team.available:
+                team.available.discard(nb)
+                locked.append(nb)
+        self._update_available_stats(locked, -1)
+        self._record_changes(team, locked)
+
+        if satisfied.get(node_id, 0) >= self.required[node_id]:
+            team.available.add(node_id)
+            self._update_available_stats((node_id,), 1)
+
+    # Node statistics
+
+    def recompute_node_stats(self) -> None:
+        """Rebuild per node solve statistics from all teams"""
+        self.solve_counts = dict()
+        self.available_counts = dict()
+        self.first_solves = dict()
+        if not self.contest:
+            return
+        for team in self.contest.teams:
+            self._update_solve_stats(team, team.solved, 1)
+            self._update_available_stats(team.available, 1)
+
+    def _update_solve_stats(self, team: Team, node_ids, delta: int) -> None:
+        for node_id in node_ids:
+            self.solve_counts[node_id] = self.solve_counts.get(node_id, 0) + delta
+            if delta > 0:
+                solved_at = team.solve_times.get(node_id)
+                first = self.first_solves.get(node_id)
+                if solved_at is not None and (first is None or solved_at < first[1]):
+                    self.first_solves[node_id] = (team.id, solved_at)
+            elif self.first_solves.get(node_id, (None,))[0] == team.id:
+                self._recompute_first_solve(node_id, except_team_id=team.id)
+
+    def _update_available_stats(self, node_ids, delta: int) -> None:
+        for node_id in node_ids:
+            self.available_counts[node_id] = self.available_counts.get(node_id, 0) + delta
+
+    def _recompute_first_solve(self, node_id: str, except_team_id: str) -> None:
+        """First solver lost the node, pick the next earliest in O(teams)"""
+        self.first_solves.pop(node_id, None)
+        for team in self.contest.teams:
+            if team.id == except_team_id or node_id not in team.solved:
+                continue
+            solved_at = team.solve_times.get(node_id)
+            first = self.first_solves.get(node_id)
+            if solved_at is not None and (first is None or solved_at < first[1]):
+                self.first_solves[node_id] = (team.id, solved_at)
+
+    # Team state versions
+
+    def node_state(self, team: Team, node_id: str) -> str:
+        if node_id in team.solved:
+            return "solved"
+        if node_id in team.available:
+            return "available"
+        return "locked"
+
+    def version_token(self) -> str:
+        """Version handed to clients, tied to the epoch so tokens from a previous load never match"""
+        return f"{self.epoch}.{self.version}"
+
+    def get_team_changes(self, team: Team, since: Optional[str]) -> Optional[Dict[str, str]]:
+        """Node states that changed for the team after version token since, None if a full refresh is needed"""
+        epoch, _, version = (since or "").partition(".")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        since = int(version)
+        if since < self.base_version or since > self.version:
+            return None
+        changes = dict()
+        for node_id, version in reversed(self.team_changes.get(team.id, {}).items()):
+            if version <= since:
+                break
+            changes[node_id] = self.node_state(team, node_id)
+        return changes
+
+    def _record_changes(self, team: Team, node_ids) -> None:
+        if not node_ids:
+            return
+        self.version += 1
+        log = self.team_changes.setdefault(team.id, dict())
+        for node_id in node_ids:
+            # Re-insert so the log stays ordered by version
+            log.pop(node_id, None)
+            log[node_id] = self.version
+
+    def continue_versions(self, previous: "ContestLogic") -> None:
+        """Number versions after those of the logic being replaced"""
+        self.graph_version = max(self.graph_version, previous.graph_version) + 1
+        self.version = max(self.version, previous.version) + 1
+        self.base_version = self.version
+        self.team_changes = dict()
+
+    def _reset_changes(self) -> None:
+        """Topology changed, every client has to refetch the full state"""
+        self.graph_version += 1
+        self.version += 1
+        self.base_version = self.version
+        self.team_changes = dict()
+
+    # Topological order
+
+    def _rebuild_topological_order(self) -> List[str]:
+        """Kahn's algorithm over the whole graph, returns the order"""
+        indeg = {nid: len(preds) for nid, preds in self.predecessors.items()}
+        queue = deque(nid for nid, d in indeg.items() if d == 0)
+        order = []
+        while queue:
+            nid = queue.popleft()
+            order.append(nid)
+            for nb in self.contest.nodes[nid].neighbors:
+                if nb in indeg:
+                    indeg[nb] -= 1
+                    if indeg[nb] == 0:
+                        queue.append(nb)
+
+        self.cyclic = len(order) < len(indeg)
+        if self.cyclic:
+            # Nodes on or behind a cycle are kept at the end in insertion order
+            placed = set(order)
+            order.extend(nid for nid in indeg if nid not in placed)
+        self.topo_index = {nid: i for i, nid in enumerate(order)}
+        return order
+
+    def _recompute_depths(self, order: List[str]) -> None:
+        """Longest path from a starting node, in topological order"""
+        self.depth = {nid: 0 for nid in order}
+        for nid in order:
+            d = self.depth[nid] + 1
+            for nb in self.contest.nodes[nid].neighbors:
+                # Back edges only exist in cyclic legacy graphs and are ignored
+                if nb in self.depth and self.topo_index[nb] > self.topo_index[nid] and d > self.depth[nb]:
+                    self.depth[nb] = d
+
+    def _search(self, start: str, forward: bool, bound: Optional[int] = None) -> Set[str]:
+        """Nodes reachable from start, optionally restricted to one side of an order bound"""
+        seen = {start}
+        stack = [start]
+        while stack:
+            nid = stack.pop()
+            nexts = self.contest.nodes[nid].neighbors if forward else self.predecessors[nid]
+            for nb in nexts:
+                if nb in seen or nb not in self.topo_index:
+                    continue
+                if bound is not None:
+                    idx = self.topo_index[nb]
+                    if (forward and idx > bound) or (not forward and idx < bound):
+                        continue
+                seen.add(nb)
+                stack.append(nb)
+        return seen
+
+    def _insert_topological_edge(self, from_id: str, to_id: str) -> None:
+        """Pearce-Kelly update of the order for a new edge, raises if it closes a cycle"""
+        lower = self.topo_index[to_id]
+        upper = self.topo_index[from_id]
+        if upper < lower:
+            return
+
+        # Only nodes ordered between the two endpoints can be affected
+        forward = self._search(to_id, forward=True, bound=upper)
+        if from_id in forward:
+            raise ValueError("Edge would create a cycle.")
+        backward = self._search(from_id, forward=False, bound=lower)
+
+        moved = sorted(backward, key=self.topo_index.get) + sorted(forward, key=self.topo_index.get)
+        slots = sorted(self.topo_index[nid] for nid in moved)
+        for nid, slot in zip(moved, slots):
+            self.topo_index[nid] = slot
+
+    def _propagate_depth(self, from_id: str, to_id: str) -> Set[str]:
+        """Push increased depths forward from a new edge, returns the nodes that got deeper"""
+        d = self.depth[from_id] + 1
+        if d <= self.depth[to_id]:
+            return set()
+        self.depth[to_id] = d
+        deepened = {to_id}
+        heap = [(self.topo_index[to_id], to_id)]
+        while heap:
+            _, nid = heapq.heappop(heap)
+            d = self.depth[nid] + 1
+            for nb in self.contest.nodes[nid].neighbors:
+                if nb in self.depth and d > self.depth[nb]:
+                    self.depth[nb] = d
+                    deepened.add(nb)
+                    heapq.heappush(heap, (self.topo_index[nb], nb))
+        return deepened
+
+    def _refresh_edge_target(self, from_id: str, to_id: str) -> None:
+        """Recount the new edge for each team and relock or unlock its target in O(teams)"""
+        required = self.required[to_id]
+        for team in self.contest.teams:
+            satisfied = self.satisfied.setdefault(team.id, dict())
+            if from_id in team.solved:
+                satisfied[to_id] = satisfied.get(to_id, 0) + 1
+            available = to_id not in team.solved and satisfied.get(to_id, 0) >= required
+            if available == (to_id in team.available):
+                continue
+            if available:
+                team.available.add(to_id)
+            else:
+                team.available.discard(to_id)
+            self._update_available_stats((to_id,), 1 if available else -1)
+            self._record_changes(team, (to_id,))
+
+    def _raise_scores(self, deepened: Set[str]) -> None:
+        """Depths only grow when an edge is added, so scores can only rise from deepened solves"""
+        for team in self.contest.teams:
+            solved = deepened & team.solved
+            if solved:
+                best = max(self.depth[nid] + 1 for nid in solved)
+                if best > self.team_scores.get(team.id, 0):
+                    self.team_scores[team.id] = best
 
     # --- Internal Assertions ---
 
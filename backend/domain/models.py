@@ -9,14 +9,22 @@ class Team(BaseModel):
     cf_handles: List[str] = Field(default_factory=list) # Codeforces handles
     solved: Set[str] = Field(default_factory=set) # ids of unlocked nodes
     available: Set[str] = Field(default_factory=set) # ids of available nodes
+    solve_times: Dict[str, int] = Field(default_factory=dict) # node id -> solve time
     access_code: str = Field(default_factory=lambda: token_urlsafe(8))
 
+class UnlockRule(str, Enum):
+    ANY = "ANY" # one solved prerequisite unlocks the node
+    ALL = "ALL" # every prerequisite has to be solved
+    THRESHOLD = "THRESHOLD" # unlock_count prerequisites have to be solved
+
 class Node(BaseModel):
     id: str
     pid: str # problem id, unique for node
     rating: int # problem difficulty
     position: Tuple[int, int] # (x, y)
     neighbors: Set[str] = Field(default_factory=set)
+    unlock: UnlockRule = UnlockRule.ANY
+    unlock_count: int = Field(default=1, ge=1) # k for THRESHOLD, capped at the number of prerequisites
 
 
 class ContestState(str, Enum):
@@ -24,10 +32,15 @@ class ContestState(str, Enum):
     RUNNING = "RUNNING"
     FINISHED = "FINISHED"
 
+class ScoringMode(str, Enum):
+    POSITION = "POSITION" # horizontal distance of the farthest solved node
+    DEPTH = "DEPTH" # longest prerequisite chain of the deepest solved node
+
 class Contest(BaseModel):
     name: str
     nodes: Dict[str, Node] = Field(default_factory=dict)
     teams: List[Team] = Field(default_factory=list)
     start_time: int = 0
     duration: int = 0
-    state: ContestState = ContestState.EDITING
\ No newline at end of file
+    state: ContestState = ContestState.EDITING
+    scoring: ScoringMode = ScoringMode.POSITION
\ No newline at end of file
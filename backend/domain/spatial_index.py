@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+Point = Tuple[int, int]
+BBox = Tuple[int, int, int, int] # (x0, y0, x1, y1), inclusive
+
+class GridIndex:
+    """Uniform grid over node positions for bounding box queries"""
+    def __init__(self, cell_size: int = 512):
+        self.cell_size = cell_size
+        self.cells: Dict[Point, Set[str]] = dict()
+        self.positions: Dict[str, Point] = dict()
+
+    def _cell(self, position: Point) -> Point:
+        return (position[0] // self.cell_size, position[1] // self.cell_size)
+
+    def clear(self) -> None:
+        self.cells = dict()
+        self.positions = dict()
+
+    def rebuild(self, items: Iterable[Tuple[str, Point]]) -> None:
+        self.clear()
+        for item_id, position in items:
+            self.insert(item_id, position)
+
+    def insert(self, item_id: str, position: Point) -> None:
+        if item_id in self.positions:
+            self.remove(item_id)
+        position = (int(position[0]), int(position[1]))
+        self.positions[item_id] = position
+        self.cells.setdefault(self._cell(position), set()).add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        position = self.positions.pop(item_id, None)
+        if position is None:
+            return
+        cell = self._cell(position)
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self.cells[cell]
+
+    def move(self, item_id: str, position: Point) -> None:
+        old = self.positions.get(item_id)
+        if old is not None and self._cell(old) == self._cell(position):
+            self.positions[item_id] = (int(position[0]), int(position[1]))
+            return
+        self.insert(item_id, position)
+
+    def query(self, bbox: BBox) -> List[str]:
+        """Ids of items whose position lies inside the box, sorted"""
+        x0, y0, x1, y1 = bbox
+        if x0 > x1 or y0 > y1:
+            return []
+        cx0, cy0 = self._cell((x0, y0))
+        cx1, cy1 = self._cell((x1, y1))
+
+        # For boxes spanning more cells than are occupied, walk the occupied ones
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            candidates = (
+                item_id
+                for (cx, cy), members in self.cells.items()
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1
+                for item_id in members
+            )
+        else:
+            candidates = (
+                item_id
+                for cx in range(cx0, cx1 + 1)
+                for cy in range(cy0, cy1 + 1)
+                for item_id in self.cells.get((cx, cy), ())
+            )
+
+        result = []
+        for item_id in candidates:
+            x, y = self.positions[item_id]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                result.append(item_id)
+        result.sort()
+        return result
+
+    def clusters(self, bbox: BBox, size: int) -> Dict[Point, List[str]]:
+        """Items inside the box grouped into size x size buckets"""
+        groups: Dict[Point, List[str]] = dict()
+        for item_id in self.query(bbox):
+            x, y = self.positions[item_id]
+            groups.setdefault((x // size, y // size), []).append(item_id)
+        return groups
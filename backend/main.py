@@ -1,26 +1,37 @@
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from api.router import api_router
 from services.contest_manager import manager
 from services.poller import poller
+from services.offload import offloader
+from services.cf_client import cf_client
+from services.profiler import ProfileMiddleware
 from utils.auth import ADMIN_TOKEN
+from utils.log import setup_logging, shutdown_logging
 import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    setup_logging()
+    # Printed directly, deployment/show_access_info.sh scrapes this line
     print(f"Admin Token: {ADMIN_TOKEN}")
     await manager.start_contest()
     asyncio.create_task(poller.start())
+    # Warm the problem catalog off the request path, only the admin problem picker needs it
+    asyncio.create_task(asyncio.to_thread(cf_client.get_problems))
 
     # Yield control to the application
     yield
 
     # Shutdown
-    poller.stop()
-    await manager.save_state()
+    await poller.shutdown()
+    await manager.save_snapshot()
+    offloader.shutdown()
+    shutdown_logging()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -33,6 +44,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admin requested profiling of a route, see /api/admin/profile
+app.add_middleware(ProfileMiddleware)
+
 # Add /api/ endpoints
 app.include_router(api_router, prefix="/api")
 
@@ -41,6 +55,20 @@ app.include_router(api_router, prefix="/api")
 def read_root():
     return {"message": "Graphway Backend"}
 
+# Liveness, answers as soon as the server accepts connections
+@app.get("/healthz")
+def liveness():
+    return {"status": "ok"}
+
+# Readiness, the API answers 503 until the contest is loaded
+@app.get("/readyz")
+def readiness():
+    ready = manager.ready.is_set()
+    return JSONResponse(
+        {"ready": ready, "problem_catalog": cf_client.is_warm()},
+        status_code=200 if ready else 503
+    )
+
 # Start uvicorn server
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
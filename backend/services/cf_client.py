@@ -1,11 +1,17 @@
 import requests
+import os
 import time
 import random
 from typing import List, Dict, Optional
+from utils.log import get_logger, RATE_LIMITED
+from services.serialization import loads
+
+logger = get_logger("cf_client")
 
 class CFClient:
     """Class for fetching problems and status from codeforces"""
-    BASE_URL = "https://codeforces.com/api"
+    # Overridable so that load tests can point the client at a mock server
+    BASE_URL = os.environ.get("CF_API_URL", "https://codeforces.com/api")
 
     def __init__(self):
         self.problems_cache: List[Dict] = []
@@ -20,19 +26,22 @@ class CFClient:
                 data = resp.json()
 
                 if data['status'] != 'OK':
-                    print(f"CF API error: {data.get('comment')}")
+                    logger.warning("CF API error: %s", data.get('comment'))
                     return []
                 
                 self.problems_cache = data['result']['problems']
                 self.last_cache_time = time.time()
-                print(f"Cached {len(self.problems_cache)} problems")
+                logger.info("Cached %d problems", len(self.problems_cache))
             
             return self.problems_cache
 
         except Exception as e:
-            print(f"error fetching problems from codeforces: {e}")
+            logger.warning("Error fetching problems from codeforces: %s", e, extra=RATE_LIMITED)
             return []
         
+    def is_warm(self) -> bool:
+        return bool(self.problems_cache)
+
     def get_random_problem(self, min_rating: int, max_rating: int) -> Optional[Dict]:
         """Draw a random problem from a specified rating range"""
         problems = [
@@ -51,12 +60,25 @@ class CFClient:
             data = resp.json()
             
             if data['status'] != 'OK':
-                print(f"CF API Error: {data.get('comment')}")
+                logger.warning("CF API error: %s", data.get('comment'), extra=RATE_LIMITED)
                 return []
 
             return data['result']
         except Exception as e:
-            print(f"Error fetching status: {e}")
+            logger.warning("Error fetching status: %s", e, extra=RATE_LIMITED)
             return []
 
+def read_submissions(f) -> List[Dict]:
+    """Submissions from a saved API response or plain list, oldest first for replaying"""
+    data = loads(f.read())
+    if isinstance(data, dict):
+        if data.get("status") != "OK":
+            raise ValueError("Not a successful Codeforces API response")
+        data = data.get("result")
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of submissions")
+    # Stable, so submissions from the same second keep their relative order
+    data.sort(key=lambda s: s.get("creationTimeSeconds", 0) if isinstance(s, dict) else 0)
+    return data
+
 cf_client = CFClient()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import gzip
+import zlib
+from typing import IO, Iterable, Iterator
+
+from domain.models import Contest, Team, Node
+from services.serialization import dumps, loads, contest_info, node_data, team_data
+
+ARCHIVE_FORMAT = "graphway-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_MEDIA_TYPE = "application/gzip"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# The archive is gzip-compressed JSON lines: one header record followed by
+# one record per node and per team. Each record carries a "kind" field.
+
+
+def _encode_record(record: dict) -> bytes:
+    return dumps(record) + b"\n"
+
+
+def iter_records(contest: Contest) -> Iterator[bytes]:
+    """Yield encoded archive records for the contest, one line at a time"""
+    yield _encode_record({
+        "kind": "contest",
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        **contest_info(contest),
+    })
+    for node in contest.nodes.values():
+        yield _encode_record({"kind": "node", **node_data(node)})
+    for team in contest.teams:
+        yield _encode_record({"kind": "team", **team_data(team)})
+
+
+def iter_archive(records: Iterable[bytes], compresslevel: int = 6) -> Iterator[bytes]:
+    """Yield gzip-compressed chunks of encoded records without building the whole file"""
+    # wbits=31 makes zlib emit a gzip header and trailer
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+    for line in records:
+        chunk = compressor.compress(line)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def read_archive(fileobj: IO[bytes]) -> Contest:
+    """Parse and validate an archive record by record"""
+    header = None
+    nodes = {}
+    teams = []
+    with gzip.GzipFile(fileobj=fileobj, mode="rb") as stream:
+        try:
+            for lineno, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = loads(line)
+                    kind = record.pop("kind", None)
+                    if header is None:
+                        if kind != "contest" or record.pop("format", None) != ARCHIVE_FORMAT:
+                            raise ValueError("missing archive header")
+                        if record.pop("version", None) != ARCHIVE_VERSION:
+                            raise ValueError("unsupported archive version")
+                        header = Contest.model_validate(record)
+                    elif kind == "node":
+                        node = Node.model_validate(record)
+                        nodes[node.id] = node
+                    elif kind == "team":
+                        teams.append(Team.model_validate(record))
+                    else:
+                        raise ValueError(f"unknown record kind '{kind}'")
+                except ValueError as e:
+                    raise ValueError(f"Invalid contest archive (line {lineno}): {e}")
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"Invalid contest archive: {e}")
+
+    if header is None:
+        raise ValueError("Invalid contest archive: file is empty")
+    header.nodes = nodes
+    header.teams = teams
+    return header
+
+
+def read_contest_file(fileobj: IO[bytes]) -> Contest:
+    """Read either an archive or a plain JSON export"""
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    if magic == GZIP_MAGIC:
+        return read_archive(fileobj)
+
+    data = loads(fileobj.read())
+    try:
+        return Contest.model_validate(data)
+    except Exception as e:
+        raise ValueError(f"Invalid contest file format: {str(e)}")
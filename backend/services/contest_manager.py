@@ -1,88 +1,200 @@
-import json
 import os
 import time
-from typing import Optional
+from typing import BinaryIO, List, Optional
 import dataclasses
-from domain.contest_logic import ContestLogic
-from domain.models import Contest, Team, Node, ContestState
+from domain.contest_logic import ContestLogic, resolve_solves
+from domain.models import Contest, Team, Node, ContestState, ScoringMode
+from services.offload import offloader, prepare_contest
+from services.snapshot import snapshot_path, read_snapshot, write_snapshot
+from services.contest_archive import iter_records
+from utils.log import get_logger
+from services.serialization import dump_contest, dump_topology, bitmask, contest_data, contest_info, node_data, team_data, team_projection
 
 AUTOSAVE_FILE = "contests/contest_autosave.json"
+PARALLEL_BATCH_SIZE = 20000 # submissions, smaller batches are applied serially
+
+logger = get_logger("manager")
 
 import asyncio
 import copy
+import itertools
+import shutil
+import tempfile
+
+
+def _spool_to_disk(upload: BinaryIO) -> str:
+    """Copy an upload to a named temporary file in chunks and return its path"""
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="import-", delete=False) as f:
+        shutil.copyfileobj(upload, f)
+        return f.name
 
 class ContestManager:
     def __init__(self):
         self.logic = ContestLogic()
         self.autosave_path = AUTOSAVE_FILE
         self.lock = asyncio.Lock()
+        self.ready = asyncio.Event() # set once the autosave is loaded
+        self._write_lock = asyncio.Lock() # autosave writes, taken without the contest lock
+        self._save_seq = 0 # autosaves encoded so far
+        self._written_seq = 0 # newest autosave on disk
+        self._topology = (None, None, None) # (graph version, digest, body)
 
     async def start_contest(self):
+        """Restore the autosave, from its snapshot if it is current, else in the background"""
         directory = os.path.dirname(self.autosave_path)
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
-            
-        if os.path.exists(self.autosave_path):
-            try:
-                await self.load_from_file(self.autosave_path)
-                print(f"Loaded {self.logic.contest.name} autosave from {self.autosave_path}")
-            except Exception as e:
-                print(f"Failed to load autosave: {e}")
-                await self._init_default()
-        else:
+
+        if not os.path.exists(self.autosave_path):
             await self._init_default()
+            self.ready.set()
+            return
+
+        started = time.perf_counter()
+        try:
+            source = await asyncio.to_thread(self._read_autosave)
+            logic = await asyncio.to_thread(read_snapshot, snapshot_path(self.autosave_path), source)
+        except Exception:
+            logger.exception("Failed to read autosave")
+            await self._start_empty()
+            return
+
+        if logic is not None:
+            # Validated and indexed when it was taken, versions carry on so client deltas stay valid
+            async with self.lock:
+                self.logic = logic
+                self._topology = (None, None, None)
+            self.ready.set()
+            logger.info("Loaded %s from snapshot in %.3fs", logic.contest.name, time.perf_counter() - started)
+            return
+
+        # Liveness is served meanwhile, readiness waits for the full load
+        asyncio.create_task(self._cold_load(source))
+
+    async def _cold_load(self, source: bytes):
+        """Validate and index the autosave in a worker, without writing it back"""
+        started = time.perf_counter()
+        try:
+            logic, _ = await offloader.run(prepare_contest, source, False)
+        except Exception:
+            logger.exception("Failed to load autosave")
+            await self._start_empty()
+            return
+        await self._swap_in((logic, None))
+        logger.info("Loaded %s autosave from %s in %.3fs",
+                    logic.contest.name, self.autosave_path, time.perf_counter() - started)
+        try:
+            # Nothing can change the contest before ready is set
+            await asyncio.to_thread(write_snapshot, snapshot_path(self.autosave_path), logic, source)
+        except Exception:
+            logger.exception("Failed to write snapshot")
+        self.ready.set()
+
+    async def _start_empty(self):
+        """Start from an empty contest after a failed load, without losing the autosave"""
+        # Later saves would overwrite it, keep it aside for a manual restore
+        failed_path = f"{self.autosave_path}.failed-{int(time.time())}"
+        try:
+            await asyncio.to_thread(os.replace, self.autosave_path, failed_path)
+            logger.warning("Moved the unloadable autosave to %s", failed_path)
+        except OSError:
+            logger.exception("Could not move the autosave aside, saving stays disabled")
+            return
+        await self._init_default()
+        self.ready.set()
 
     async def reset_contest(self):
         """Resets the contest to a default empty state"""
         async with self.lock:
             self._init_default_sync()
-            await self.save_state_internal()
+            pending = self._encode_state()
+        await self._persist(pending)
 
     async def _init_default(self):
         async with self.lock:
             self._init_default_sync()
 
     def _init_default_sync(self):
-        self.logic.contest = Contest(
+        self.logic.load_contest(Contest(
             name="New Contest",
             nodes={},
             teams=[],
             start_time=int(time.time()) + 3600,
             duration=18000,
             state=ContestState.EDITING
-        )
-        self.logic.update_graph()
+        ))
 
     async def save_state(self):
         """Save current contest state to file (public async wrapper)"""
+        if not self.ready.is_set():
+            # Do not overwrite an autosave that is still being loaded
+            return
         async with self.lock:
-            await self.save_state_internal()
-
-    async def save_state_internal(self):
-        """Internal save, assumes lock is held"""
-        data = self._serialize_contest(self.logic.contest)
-        with open(self.autosave_path, "w") as f:
-            json.dump(data, f, indent=2)
-
-    async def load_from_file(self, path: str):
-        with open(path, "r") as f:
-            data = json.load(f)
-        
-        async with self.lock:
-            contest = self._deserialize_contest(data)
-            self.logic.load_contest(contest)
-            await self.save_state_internal()
+            pending = self._encode_state()
+        await self._persist(pending)
 
-    async def load_contest_from_data(self, data: dict):
+    async def save_snapshot(self):
+        """Save the autosave and a snapshot of it for a fast next start"""
+        if not self.ready.is_set():
+            return
+        async with self.lock:
+            pending = self._encode_state()
+            write_snapshot(snapshot_path(self.autosave_path), self.logic, pending[1])
+        await self._persist(pending)
+
+    def _encode_state(self, data: bytes = None):
+        """Encode the autosave, assumes lock is held"""
+        self._save_seq += 1
+        return self._save_seq, dump_contest(self.logic.contest) if data is None else data
+
+    async def _persist(self, pending):
+        """Write an encoded autosave off the event loop, unless a newer one is already on disk"""
+        seq, data = pending
+        async with self._write_lock:
+            if seq <= self._written_seq:
+                return
+            await asyncio.to_thread(self._write_autosave, data)
+            self._written_seq = seq
+
+    def _write_autosave(self, data: bytes):
+        with open(self.autosave_path, "wb") as f:
+            f.write(data)
+
+    def _read_autosave(self) -> bytes:
+        with open(self.autosave_path, "rb") as f:
+            return f.read()
+
+    async def import_contest_file(self, upload: BinaryIO):
+        """Parse and index an uploaded export in a worker, then swap it in"""
+        # Workers open the export by path, the upload is never held in memory whole
+        path = await asyncio.to_thread(_spool_to_disk, upload)
+        try:
+            prepared = await offloader.run(prepare_contest, path)
+        finally:
+            os.unlink(path)
+        await self._swap_in(prepared)
+
+    async def _swap_in(self, prepared):
+        """Replace the whole contest with one prepared off the event loop"""
+        logic, data = prepared
         async with self.lock:
-            contest = self._deserialize_contest(data)
-            self.logic.load_contest(contest)
-            await self.save_state_internal()
+            logic.continue_versions(self.logic)
+            self.logic = logic
+            self._topology = (None, None, None)
+            pending = self._encode_state(data) if data is not None else None
+        if pending is not None:
+            await self._persist(pending)
 
     async def get_contest_state_data(self) -> dict:
         async with self.lock:
             return self._serialize_contest(self.logic.contest)
 
+    async def get_archive_records(self) -> List[bytes]:
+        """Encoded archive records, compressed later without the lock"""
+        async with self.lock:
+            return list(iter_records(self.logic.contest))
+
     # Graph operations
 
     async def set_contest_state(self, state: ContestState):
@@ -94,6 +206,10 @@ class ContestManager:
             if self.logic.contest.state != ContestState.EDITING:
                 raise ValueError("Cannot modify graph during contest (must be in EDITING state)")
             if node.id in self.logic.contest.nodes:
+                current = self.logic.contest.nodes[node.id]
+                for field in ("unlock", "unlock_count"):
+                    if field not in node.model_fields_set:
+                        setattr(node, field, getattr(current, field))
                 self.logic.update_node(node)
             else:
                 self.logic.add_node(node)
@@ -118,12 +234,14 @@ class ContestManager:
 
     # Contest operations
 
-    async def update_config(self, start_time: int, duration: int, name: str = None):
+    async def update_config(self, start_time: int, duration: int, name: str = None, scoring: ScoringMode = None):
         async with self.lock:
             self.logic.contest.start_time = start_time
             self.logic.contest.duration = duration
             if name:
                 self.logic.rename(name)
+            if scoring:
+                self.logic.contest.scoring = scoring
 
     async def add_team(self, team: Team):
         async with self.lock:
@@ -137,20 +255,38 @@ class ContestManager:
         async with self.lock:
             self.logic.delete_team(team_id)
 
+    def get_handles(self) -> set:
+        """Registered handles, the set is replaced rather than mutated so it can be read without the lock"""
+        return self.logic.handles
+
     async def process_submissions(self, subs):
         """Processes submissions with lock"""
         async with self.lock:
-            self.logic.update_state(subs)
+            # Threads would share the GIL, only worker processes make this faster
+            if len(subs) < PARALLEL_BATCH_SIZE or offloader.mode != "process" or offloader.workers < 2:
+                self.logic.update_state(subs)
+                return
+            # Replays and catch-up: teams are independent, so replay their
+            # slices in parallel and commit the resulting solves in one pass
+            if not self.logic.contest:
+                return
+            started = time.perf_counter()
+            jobs = self.logic.resolve_jobs(subs, offloader.workers)
+            self.logic.apply_solves(await offloader.map(resolve_solves, jobs))
+            logger.info("Applied a batch of %d submissions in %d parts in %.3fs",
+                        len(subs), len(jobs), time.perf_counter() - started)
 
     async def force_solve_node(self, team_id: str, node_id: str):
         async with self.lock:
             self.logic.force_solve_node(team_id, node_id)
-            await self.save_state_internal()
+            pending = self._encode_state()
+        await self._persist(pending)
 
     async def force_unsolve_node(self, team_id: str, node_id: str):
         async with self.lock:
             self.logic.force_unsolve_node(team_id, node_id)
-            await self.save_state_internal()
+            pending = self._encode_state()
+        await self._persist(pending)
 
     # Data access wrappers
 
@@ -161,8 +297,8 @@ class ContestManager:
                 return None
             return {
                 "name": team.name,
-                "solved": list(team.solved),
-                "available": list(team.available)
+                "solved": sorted(team.solved),
+                "available": sorted(team.available)
             }
 
     async def get_leaderboard_data(self):
@@ -178,27 +314,47 @@ class ContestManager:
                 })
             return leaderboard
 
-    async def get_team_view(self, token: str):
+    async def get_node_stats(self):
+        """Per node solve counts, availability and first solver"""
         async with self.lock:
-            team = next((t for t in self.logic.contest.teams if t.access_code == token), None)
-            if not team:
-                return None
-            
+            logic = self.logic
+            team_names = {t.id: t.name for t in logic.contest.teams}
             nodes = []
-            for nid, node in self.logic.contest.nodes.items():
-                state = "locked"
-                if nid in team.solved:
-                    state = "solved"
-                elif nid in team.available:
-                    state = "available"
-                    
+            for nid, node in logic.contest.nodes.items():
+                first = logic.first_solves.get(nid)
                 nodes.append({
                     "id": nid,
                     "pid": node.pid,
-                    "position": node.position,
-                    "state": state,
-                    "neighbors": list(node.neighbors)
+                    "solved": logic.solve_counts.get(nid, 0),
+                    "available": logic.available_counts.get(nid, 0),
+                    "first_solve": {"team": team_names.get(first[0]), "time": first[1]} if first else None
                 })
+            return {
+                "teams": len(logic.contest.teams),
+                "nodes": nodes
+            }
+
+    async def get_team_view(self, token: str, viewport=None):
+        async with self.lock:
+            team = next((t for t in self.logic.contest.teams if t.access_code == token), None)
+            if not team:
+                return None
+
+            def describe(nid, node, lod):
+                entry = {
+                    "id": nid,
+                    "position": [node.position[0], node.position[1]],
+                    "state": self.logic.node_state(team, nid),
+                    "neighbors": sorted(node.neighbors)
+                }
+                if lod == "full":
+                    entry["pid"] = node.pid
+                return entry
+
+            if viewport is None:
+                graph = {"nodes": [describe(nid, node, "full") for nid, node in self.logic.contest.nodes.items()]}
+            else:
+                graph = self._visible_graph(viewport, describe, team)
             
             score = self.logic.get_team_progress(team.id)
             return {
@@ -206,15 +362,56 @@ class ContestManager:
                 "cf_handles": team.cf_handles,
                 "solved_count": len(team.solved),
                 "score": score,
-                "nodes": nodes,
-                "contest": {
-                    "name": self.logic.contest.name,
-                    "start_time": self.logic.contest.start_time,
-                    "duration": self.logic.contest.duration,
-                    "state": self.logic.contest.state
-                }
+                **graph,
+                "contest": contest_info(self.logic.contest),
+                "version": self.logic.version_token(),
+                "topology": self._get_topology_internal()[0]
             }
+
+    async def get_topology(self):
+        """Return (digest, body) of the graph as shown to teams"""
+        async with self.lock:
+            return self._get_topology_internal()
+
+    def _get_topology_internal(self):
+        graph_version, digest, body = self._topology
+        if graph_version != self.logic.graph_version:
+            digest, body = dump_topology(self.logic.contest)
+            self._topology = (self.logic.graph_version, digest, body)
+        return digest, body
+
+    async def get_team_state(self, token: str, since: Optional[str] = None, as_bitmask: bool = False):
+        """Team node states changed after version token since, or solved/available bitmasks"""
+        async with self.lock:
+            team = next((t for t in self.logic.contest.teams if t.access_code == token), None)
+            if not team:
+                return None
+
+            state = {
+                "version": self.logic.version_token(),
+                "topology": self._get_topology_internal()[0],
+                "solved_count": len(team.solved),
+                "score": self.logic.get_team_progress(team.id),
+                "contest": contest_info(self.logic.contest)
+            }
+            if as_bitmask:
+                # Bits follow the node order of the topology resource
+                state["solved"] = bitmask(self.logic.contest.nodes, team.solved)
+                state["available"] = bitmask(self.logic.contest.nodes, team.available)
+                return state
+
+            changes = self.logic.get_team_changes(team, since)
+            state["full"] = changes is None
+            if changes is None:
+                changes = {nid: self.logic.node_state(team, nid) for nid in self.logic.contest.nodes}
+            state["nodes"] = changes
+            return state
             
+    def get_schedule(self) -> dict:
+        """Start time, duration and state, read without the lock so the poller never waits on it"""
+        contest = self.logic.contest
+        return {"start_time": contest.start_time, "duration": contest.duration, "state": contest.state}
+
     async def get_admin_status(self):
         async with self.lock:
             contest = self.logic.contest
@@ -225,50 +422,96 @@ class ContestManager:
                     "name": contest.name,
                     "start_time": contest.start_time,
                     "duration": contest.duration,
-                    "state": contest.state
+                    "state": contest.state,
+                    "scoring": contest.scoring
                 }
             }
 
-    async def get_graph_data(self):
+    async def get_graph_data(self, viewport=None):
         async with self.lock:
             nodes = self.logic.contest.nodes
-            return {
-                "nodes": [
-                    {
-                        "id": n.id,
-                        "pid": n.pid,
-                        "rating": n.rating,
-                        "position": n.position,
-                        "neighbors": list(n.neighbors)
-                    } for n in nodes.values()
-                ]
-            }
+            if viewport is None:
+                return {
+                    "nodes": [node_data(n) for n in nodes.values()]
+                }
+
+            def describe(nid, node, lod):
+                if lod == "full":
+                    return node_data(node)
+                return {
+                    "id": nid,
+                    "position": [node.position[0], node.position[1]],
+                    "neighbors": sorted(node.neighbors)
+                }
+
+            return self._visible_graph(viewport, describe)
+
+    def _visible_graph(self, viewport, describe, team: Team = None) -> dict:
+        """Nodes inside the viewport plus the outside endpoints of their edges, or clusters"""
+        logic = self.logic
+        nodes = logic.contest.nodes
+        if viewport.lod == "cluster":
+            clusters = []
+            for ids in logic.spatial.clusters(viewport.bbox, viewport.cluster_size).values():
+                positions = [nodes[nid].position for nid in ids]
+                cluster = {
+                    "position": [sum(p[0] for p in positions) // len(ids), sum(p[1] for p in positions) // len(ids)],
+                    "count": len(ids)
+                }
+                if team is not None:
+                    cluster["solved"] = sum(1 for nid in ids if nid in team.solved)
+                    cluster["available"] = sum(1 for nid in ids if nid in team.available)
+                clusters.append(cluster)
+            return {"clusters": clusters}
+
+        visible = logic.spatial.query(viewport.bbox)
+        visible_set = set(visible)
+        external = set()
+        for nid in visible:
+            external.update(nb for nb in nodes[nid].neighbors if nb in nodes)
+            external.update(logic.predecessors.get(nid, ()))
+        external -= visible_set
+        return {
+            "nodes": [describe(nid, nodes[nid], viewport.lod) for nid in visible],
+            # Just enough to draw edges that cross the viewport border
+            "external": [
+                {
+                    "id": nid,
+                    "position": [nodes[nid].position[0], nodes[nid].position[1]],
+                    "neighbors": sorted(nodes[nid].neighbors & visible_set)
+                } for nid in sorted(external)
+            ]
+        }
 
     async def get_all_teams(self):
          async with self.lock:
-            # Convert sets to lists for JSON serialization
-            return [
-                {
-                    "id": t.id,
-                    "name": t.name,
-                    "cf_handles": t.cf_handles,
-                    "solved": list(t.solved),
-                    "available": list(t.available),
-                    "access_code": t.access_code
+            return [team_data(t) for t in self.logic.contest.teams]
+
+    async def list_teams(self, limit: int, cursor: str = None, fields=None, summary: bool = False, **filters):
+        """One page of teams in name order, or only match counts with summary"""
+        async with self.lock:
+            if summary:
+                histogram = self.logic.count_teams(**filters)
+                return {
+                    "total": sum(histogram.values()),
+                    # JSON object keys are strings
+                    "solved_counts": {str(count): teams for count, teams in sorted(histogram.items())}
                 }
-                for t in self.logic.contest.teams
-            ]
+
+            matches = self.logic.find_teams(after=cursor, **filters)
+            page = list(itertools.islice(matches, limit + 1))
+            more = len(page) > limit
+            page = page[:limit]
+            return {
+                "teams": [team_data(t) if fields is None else team_projection(t, fields) for t in page],
+                # Name of the last team, names are unique and stable under inserts and deletes
+                "next_cursor": page[-1].name if more else None
+            }
 
     # Internal Helpers for Serialization
 
     def _serialize_contest(self, contest: Contest) -> dict:
-        return contest.model_dump(mode='json')
-
-    def _deserialize_contest(self, data: dict) -> Contest:
-        try:
-            return Contest.model_validate(data)
-        except Exception as e:
-            raise ValueError(f"Invalid contest file format: {str(e)}")
+        return contest_data(contest)
 
 # Global Instance
 manager = ContestManager()
@@ -0,0 +1,80 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple, Union
+
+from domain.contest_logic import ContestLogic
+from services.contest_archive import read_contest_file
+from services.serialization import dump_contest
+from utils.log import get_logger
+
+# "process" runs CPU heavy work in a worker process so it does not hold the
+# GIL of the event loop, "thread" uses the default thread pool instead
+OFFLOAD_MODE = os.environ.get("OFFLOAD_MODE", "process")
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", 0)) or os.cpu_count() or 1
+
+logger = get_logger("offload")
+
+
+def prepare_contest(source: Union[bytes, str], dump: bool = True) -> Tuple[ContestLogic, Optional[bytes]]:
+    """Parse, validate and index a contest from upload bytes or a file path
+
+    With dump the contest is also serialized for the autosave.
+    """
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            contest = read_contest_file(io.BytesIO(source))
+        else:
+            with open(source, "rb") as f:
+                contest = read_contest_file(f)
+    except json.JSONDecodeError:
+        # Decode errors carry the whole document, do not ship it back
+        raise ValueError("Invalid JSON file")
+
+    logic = ContestLogic()
+    logic.load_contest(contest)
+    return logic, dump_contest(contest) if dump else None
+
+
+class Offloader:
+    """Runs blocking functions outside the event loop"""
+
+    def __init__(self, mode: str = OFFLOAD_MODE, workers: int = OFFLOAD_WORKERS):
+        self.mode = mode
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.mode != "process":
+            return None
+        if self._pool is None:
+            # spawn avoids forking a process that runs an event loop and threads
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), fn, *args)
+        except BrokenProcessPool:
+            logger.warning("Worker process died, retrying %s in a thread", fn.__name__)
+            self._pool = None
+            return await loop.run_in_executor(None, fn, *args)
+
+    async def map(self, fn, jobs) -> list:
+        """Run fn over argument tuples in parallel, results in job order"""
+        if len(jobs) <= 1:
+            return [fn(*args) for args in jobs]
+        return list(await asyncio.gather(*(self.run(fn, *args) for args in jobs)))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+offloader = Offloader()
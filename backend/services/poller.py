@@ -2,53 +2,213 @@ import asyncio
 import time
 from services.cf_client import cf_client
 from services.contest_manager import manager
+from services.profiler import profiler
 from domain.models import ContestState
+from utils.log import get_logger, new_cycle, cycle_id, RATE_LIMITED
+
+logger = get_logger("poller")
+
+QUEUE_SIZE = 2 # fetched or parsed batches waiting for the next stage
+DRAIN_TIMEOUT = 10 # seconds to finish queued work on shutdown
+
+_DONE = None # sentinel passed down the pipeline on shutdown
+
+class StageStats:
+    """Per stage counters and timings"""
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.batches += 1
+        self.items += items
+        self.total_time += seconds
+        self.last_time = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "last_ms": round(self.last_time * 1000, 3),
+            "avg_ms": round(self.total_time / self.batches * 1000, 3) if self.batches else 0.0
+        }
 
 class Poller:
+    """Ingest pipeline: fetch -> parse/filter -> apply -> persist
+
+    Stages are connected by bounded queues, so a slow stage holds back the
+    ones before it instead of letting work pile up, while a slow save or
+    lock wait no longer delays the next fetch.
+    """
     def __init__(self, interval: int = 10):
         self.interval = interval
         self.running = False
+        self.stats = {name: StageStats() for name in ("fetch", "parse", "apply", "persist")}
+        self._stop = asyncio.Event()
+        self._dirty = asyncio.Event()
+        self._tasks = []
 
     async def start(self):
         self.running = True
+        self._stop = asyncio.Event()
+        self._dirty = asyncio.Event()
+        fetched = asyncio.Queue(maxsize=QUEUE_SIZE)
+        parsed = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._tasks = [
+            asyncio.create_task(self._fetcher(fetched)),
+            asyncio.create_task(self._parser(fetched, parsed)),
+            asyncio.create_task(self._applier(parsed)),
+            asyncio.create_task(self._persister()),
+        ]
+        await asyncio.gather(*self._tasks)
+
+    def stop(self):
+        """Ask the fetcher to stop, queued batches are still applied and saved"""
+        self.running = False
+        self._stop.set()
+
+    async def shutdown(self):
+        """Stop and wait for the pipeline to drain"""
+        self.stop()
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*self._tasks, return_exceptions=True), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Poller did not drain within %ds", DRAIN_TIMEOUT)
+
+    def get_stats(self) -> dict:
+        return {name: stage.as_dict() for name, stage in self.stats.items()}
+
+    async def _sleep(self, seconds: float):
+        """Sleep that returns early on stop"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    # Stages
+
+    async def _fetcher(self, out: asyncio.Queue):
+        # Nothing to poll for until the autosave is loaded
+        while self.running and not manager.ready.is_set():
+            await self._sleep(0.2)
         while self.running:
-            status = await manager.get_admin_status()
-            contest_info = status["contest"]
-            start_time = contest_info["start_time"]
-            duration = contest_info["duration"]
-            state = contest_info["state"]
-
-            now = int(time.time())
-
-            if state == ContestState.FINISHED and start_time + duration > now:
-                print("Contest switched back to running state")
-                await manager.set_contest_state(ContestState.RUNNING)
-                await manager.save_state()
-                
-            if state != ContestState.RUNNING:
-                print("Contest is not in running state. Poller is not polling.")
-                await asyncio.sleep(self.interval)
+            new_cycle()
+            try:
+                with profiler.section("poll"):
+                    await self._fetch_once(out)
+            except Exception:
+                logger.exception("Poller iteration failed")
+            await self._sleep(self.interval)
+        await out.put(_DONE)
+
+    async def _fetch_once(self, out: asyncio.Queue):
+        schedule = manager.get_schedule()
+        start_time = schedule["start_time"]
+        duration = schedule["duration"]
+        state = schedule["state"]
+
+        now = int(time.time())
+
+        if state == ContestState.FINISHED and start_time + duration > now:
+            logger.info("Contest switched back to running state")
+            await manager.set_contest_state(ContestState.RUNNING)
+            await manager.save_state()
+
+        if state != ContestState.RUNNING:
+            logger.info("Contest is not in running state. Poller is not polling.", extra=RATE_LIMITED)
+            return
+
+        logger.debug("Running state. Poller is polling.")
+
+        if start_time <= now <= start_time + duration:
+            logger.debug("Poller is fetching submissions.")
+            started = time.perf_counter()
+            subs = await asyncio.to_thread(cf_client.get_recent_status, count=500)
+            self.stats["fetch"].record(len(subs), time.perf_counter() - started)
+            if subs:
+                # Blocks while the parser is behind
+                await out.put((cycle_id.get(), subs))
+        elif now > start_time + duration:
+            logger.info("Contest has finished. Poller will stop fetching submissions.")
+            await manager.set_contest_state(ContestState.FINISHED)
+            await manager.save_state()
+
+    async def _parser(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while True:
+            item = await inp.get()
+            if item is _DONE:
+                await out.put(_DONE)
+                return
+            cid, subs = item
+            cycle_id.set(cid)
+            started = time.perf_counter()
+            accepted = self._filter(subs, manager.get_handles())
+            self.stats["parse"].record(len(subs), time.perf_counter() - started)
+            logger.debug("Kept %d of %d submissions", len(accepted), len(subs))
+            if accepted:
+                await out.put((cid, accepted))
+
+    @staticmethod
+    def _filter(subs, handles) -> list:
+        """Accepted submissions of registered handles, oldest first"""
+        accepted = []
+        for sub in subs:
+            try:
+                if sub.get("verdict") == "OK" and sub["author"]["members"][0]["handle"] in handles:
+                    accepted.append(sub)
+            except (KeyError, IndexError, TypeError, AttributeError):
                 continue
+        # recentStatus is newest first, apply in solve order so unlocks chain within a batch
+        accepted.sort(key=lambda s: s.get("creationTimeSeconds", 0))
+        return accepted
 
-            print("Running state. Poller is polling.")
+    async def _applier(self, inp: asyncio.Queue):
+        while True:
+            item = await inp.get()
+            done = item is _DONE
+            batch = [] if done else [item]
+            # Coalesce everything already waiting into one locked update
+            while not done and not inp.empty():
+                nxt = inp.get_nowait()
+                if nxt is _DONE:
+                    done = True
+                else:
+                    batch.append(nxt)
 
-            if start_time <= now <= start_time + duration:
-                print("Poller is fetching submissions.")
+            if batch:
+                cycle_id.set(batch[-1][0])
+                subs = [sub for _, part in batch for sub in part]
+                started = time.perf_counter()
                 try:
-                    subs = await asyncio.to_thread(cf_client.get_recent_status, count=500)
-                    if subs:
+                    with profiler.section("apply"):
                         await manager.process_submissions(subs)
-                        await manager.save_state()
-                except Exception as e:
-                    print(f"Poller iteration failed: {e}")
-            elif now > start_time + duration:
-                print("Contest has finished. Poller will stop fetching submissions.")
-                await manager.set_contest_state(ContestState.FINISHED)
-                await manager.save_state()
-            
-            await asyncio.sleep(self.interval)
+                    self._dirty.set()
+                    logger.info("Applied %d submissions in %.3fs", len(subs), time.perf_counter() - started)
+                except Exception:
+                    logger.exception("Applying submissions failed")
+                self.stats["apply"].record(len(subs), time.perf_counter() - started)
 
-    def stop(self):
-        self.running = False
+            if done:
+                self._dirty.set()
+                return
+
+    async def _persister(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            started = time.perf_counter()
+            try:
+                with profiler.section("save"):
+                    await manager.save_state()
+            except Exception:
+                logger.exception("Saving state failed")
+            self.stats["persist"].record(1, time.perf_counter() - started)
+            # The applier has finished once the fetcher stopped and nothing is pending
+            if not self.running and all(t.done() for t in self._tasks[:3]):
+                return
 
 poller = Poller()
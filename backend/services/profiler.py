@@ -0,0 +1,212 @@
+import asyncio
+import cProfile
+import contextlib
+import io
+import marshal
+import pstats
+import time
+import tracemalloc
+from typing import Dict, Optional
+from utils.log import get_logger
+
+SCOPES = ("poll", "apply", "save", "route")
+MAX_SECONDS = 600
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+logger = get_logger("profiler")
+
+# Shared so that instrumented code allocates nothing while profiling is off
+_OFF = contextlib.nullcontext()
+
+# Keep the snapshots themselves out of the allocation report
+_OWN_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class Capture:
+    """One profiling window over a single scope"""
+
+    def __init__(self, scope: str, route: Optional[str], seconds: float, cycles: Optional[int], memory: bool):
+        self.scope = scope
+        self.route = route
+        self.seconds = seconds
+        self.cycles = cycles
+        self.memory = memory
+        self.owns_tracing = False # tracemalloc was started for this capture
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.completed = 0 # scoped sections that ran to the end
+        self.profile = cProfile.Profile()
+        self.depth = 0 # sections currently running, they can interleave on the event loop
+        self.allocations: Dict[str, list] = dict() # "file:line" -> [size diff, count diff]
+        self.peak_memory = 0
+        self.stats: Optional[pstats.Stats] = None
+
+    def matches(self, scope: str, path: Optional[str] = None) -> bool:
+        if scope != self.scope:
+            return False
+        return scope != "route" or (path is not None and path.startswith(self.route))
+
+    def as_dict(self) -> dict:
+        return {
+            "scope": self.scope,
+            "route": self.route,
+            "seconds": self.seconds,
+            "cycles": self.cycles,
+            "memory": self.memory,
+            "started": self.started,
+            "finished": self.finished,
+            "completed": self.completed,
+        }
+
+
+class Profiler:
+    """On-demand cProfile and tracemalloc captures scoped to a poll stage or route
+
+    Instrumented code calls section(), which is a shared no-op while no
+    capture is running. cProfile follows the event loop thread, so work of
+    other tasks that runs while a section awaits is included. Thread and
+    process offloaded work is not.
+    """
+
+    def __init__(self):
+        self.capture: Optional[Capture] = None # running capture
+        self.last: Optional[Capture] = None # most recent capture, running or finished
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self, scope: str, route: str = None, seconds: float = 30, cycles: int = None, memory: bool = False) -> Capture:
+        if self.capture is not None:
+            raise ValueError("A profile capture is already running")
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope '{scope}'")
+        if scope == "route" and not route:
+            raise ValueError("Route scope needs a route path prefix")
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"Seconds must be between 0 and {MAX_SECONDS}")
+        if cycles is not None and cycles < 1:
+            raise ValueError("Cycles must be positive")
+
+        capture = Capture(scope, route if scope == "route" else None, seconds, cycles, memory)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            capture.owns_tracing = True
+        self.capture = self.last = capture
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+        logger.info("Profiling %s for up to %ss", route or scope, seconds)
+        return capture
+
+    def stop(self) -> Optional[Capture]:
+        """Finish the running capture, sections still in flight are cut short"""
+        capture = self.capture
+        if capture is None:
+            return None
+        self.capture = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if capture.depth:
+            capture.profile.disable()
+            capture.depth = 0
+        if capture.memory:
+            capture.peak_memory = tracemalloc.get_traced_memory()[1]
+            if capture.owns_tracing:
+                tracemalloc.stop()
+        capture.finished = time.time()
+        capture.stats = pstats.Stats(capture.profile) if capture.completed else None
+        logger.info("Profile of %s finished after %d sections", capture.route or capture.scope, capture.completed)
+        return capture
+
+    def section(self, scope: str, path: str = None):
+        """Context manager around one run of a scoped piece of work"""
+        capture = self.capture
+        if capture is None or not capture.matches(scope, path):
+            return _OFF
+        return self._section(capture)
+
+    @contextlib.contextmanager
+    def _section(self, capture: Capture):
+        before = tracemalloc.take_snapshot().filter_traces(_OWN_ALLOCATIONS) if capture.memory else None
+        if capture.depth == 0:
+            capture.profile.enable()
+        capture.depth += 1
+        try:
+            yield
+        finally:
+            # The capture may have been stopped while this section was running
+            if self.capture is capture:
+                capture.depth -= 1
+                if capture.depth == 0:
+                    capture.profile.disable()
+                if before is not None:
+                    self._add_allocations(capture, before)
+                capture.completed += 1
+                if capture.cycles is not None and capture.completed >= capture.cycles:
+                    self.stop()
+
+    @staticmethod
+    def _add_allocations(capture: Capture, before: tracemalloc.Snapshot) -> None:
+        after = tracemalloc.take_snapshot().filter_traces(_OWN_ALLOCATIONS)
+        for diff in after.compare_to(before, "lineno"):
+            if not diff.size_diff:
+                continue
+            frame = diff.traceback[0]
+            entry = capture.allocations.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            entry[0] += diff.size_diff
+            entry[1] += diff.count_diff
+
+    # Results
+
+    def status(self) -> dict:
+        return {
+            "running": self.capture is not None,
+            "capture": self.last.as_dict() if self.last else None,
+        }
+
+    def report(self, top: int = TOP_FUNCTIONS) -> Optional[dict]:
+        """Top functions by cumulative time and top allocation sites of the last finished capture"""
+        capture = self.last
+        if capture is None or capture.finished is None:
+            return None
+        functions = ""
+        if capture.stats is not None:
+            stream = io.StringIO()
+            capture.stats.stream = stream
+            capture.stats.sort_stats("cumulative").print_stats(top)
+            functions = stream.getvalue()
+        allocations = sorted(capture.allocations.items(), key=lambda item: abs(item[1][0]), reverse=True)
+        return {
+            "capture": capture.as_dict(),
+            "functions": functions,
+            "allocations": [
+                {"location": location, "size_diff": size, "count_diff": count}
+                for location, (size, count) in allocations[:TOP_ALLOCATIONS]
+            ],
+            "peak_memory": capture.peak_memory,
+        }
+
+    def dump(self) -> Optional[bytes]:
+        """Last finished capture in the pstats file format, for snakeviz or pstats.Stats"""
+        capture = self.last
+        if capture is None or capture.stats is None:
+            return None
+        return marshal.dumps(capture.stats.stats)
+
+
+class ProfileMiddleware:
+    """ASGI middleware that profiles requests under the captured route prefix"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # One attribute check per request while profiling is off
+        if profiler.capture is None or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with profiler.section("route", scope["path"]):
+            await self.app(scope, receive, send)
+
+
+profiler = Profiler()
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import json
+from typing import Any, Iterable, Tuple
+
+from fastapi.responses import Response
+
+from domain.models import Contest, Team, Node
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fallback when orjson is not installed
+    orjson = None
+
+# Serialization for the hot paths (autosave, team polling, leaderboard).
+# Models are flattened straight into plain JSON types with sorted sets so the
+# output is stable, then encoded to bytes in one call, bypassing both
+# pydantic's model_dump and FastAPI's jsonable_encoder.
+
+
+def dumps(data: Any) -> bytes:
+    """Encode plain JSON data to bytes with sorted keys"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data) -> Any:
+    """Decode JSON bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def node_data(node: Node) -> dict:
+    return {
+        "id": node.id,
+        "pid": node.pid,
+        "rating": node.rating,
+        "position": [node.position[0], node.position[1]],
+        "neighbors": sorted(node.neighbors),
+        "unlock": node.unlock.value,
+        "unlock_count": node.unlock_count,
+    }
+
+
+def team_data(team: Team) -> dict:
+    return {
+        "id": team.id,
+        "name": team.name,
+        "cf_handles": list(team.cf_handles),
+        "solved": sorted(team.solved),
+        "available": sorted(team.available),
+        "solve_times": dict(team.solve_times),
+        "access_code": team.access_code,
+    }
+
+
+# Fields that the admin teams listing can project, the counts avoid shipping node sets
+TEAM_FIELDS = {
+    "id": lambda team: team.id,
+    "name": lambda team: team.name,
+    "cf_handles": lambda team: list(team.cf_handles),
+    "access_code": lambda team: team.access_code,
+    "solved": lambda team: sorted(team.solved),
+    "available": lambda team: sorted(team.available),
+    "solve_times": lambda team: dict(team.solve_times),
+    "solved_count": lambda team: len(team.solved),
+    "available_count": lambda team: len(team.available),
+}
+
+
+def team_projection(team: Team, fields) -> dict:
+    return {field: TEAM_FIELDS[field](team) for field in fields}
+
+
+def contest_info(contest: Contest) -> dict:
+    """Contest metadata without nodes and teams"""
+    return {
+        "name": contest.name,
+        "start_time": contest.start_time,
+        "duration": contest.duration,
+        "state": contest.state.value,
+        "scoring": contest.scoring.value,
+    }
+
+
+def contest_data(contest: Contest) -> dict:
+    """Full contest in the same shape as Contest.model_dump(mode='json')"""
+    data = contest_info(contest)
+    data["nodes"] = {nid: node_data(node) for nid, node in contest.nodes.items()}
+    data["teams"] = [team_data(team) for team in contest.teams]
+    return data
+
+
+def dump_contest(contest: Contest) -> bytes:
+    return dumps(contest_data(contest))
+
+
+def dump_topology(contest: Contest) -> Tuple[str, bytes]:
+    """Static graph shown to teams and its content hash"""
+    body = dumps({
+        "nodes": [
+            {
+                "id": node.id,
+                "pid": node.pid,
+                "position": [node.position[0], node.position[1]],
+                "neighbors": sorted(node.neighbors),
+                "unlock": node.unlock.value,
+                "unlock_count": node.unlock_count,
+            } for node in contest.nodes.values()
+        ]
+    })
+    return hashlib.sha256(body).hexdigest()[:16], body
+
+
+def bitmask(node_ids: Iterable[str], members) -> str:
+    """Base64 bitmap with bit i set when the i-th node id is in members"""
+    node_ids = list(node_ids)
+    bits = bytearray((len(node_ids) + 7) // 8)
+    for i, node_id in enumerate(node_ids):
+        if node_id in members:
+            bits[i >> 3] |= 1 << (i & 7)
+    return base64.b64encode(bytes(bits)).decode("ascii")
+
+
+class FastJSONResponse(Response):
+    """Response that encodes plain JSON data with the fast backend"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
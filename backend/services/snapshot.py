@@ -0,0 +1,90 @@
+import hashlib
+import hmac
+import json
+import os
+import pickle
+from typing import Optional
+from domain.contest_logic import ContestLogic
+from domain.models import Contest
+from utils.log import get_logger
+
+# Bump when the meaning of ContestLogic's derived indexes changes
+SNAPSHOT_FORMAT = 2
+
+# Snapshots are pickles, they are signed with a key kept outside the contests
+# volume and only unpickled when the signature matches. Without a key they are
+# neither written nor read and every start does the cold load.
+SNAPSHOT_KEY = os.environ.get("SNAPSHOT_KEY", "").encode()
+
+logger = get_logger("snapshot")
+
+
+def snapshot_path(autosave_path: str) -> str:
+    return autosave_path + ".snapshot"
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _fingerprint() -> str:
+    """Changes whenever the pickled models or the index layout change"""
+    schema = json.dumps(Contest.model_json_schema(), sort_keys=True)
+    indexes = ",".join(sorted(vars(ContestLogic())))
+    return _digest(f"{SNAPSHOT_FORMAT}|{schema}|{indexes}".encode())
+
+
+def _sign(header: bytes, body: bytes) -> str:
+    return hmac.new(SNAPSHOT_KEY, header + b"\n" + body, hashlib.sha256).hexdigest()
+
+
+def write_snapshot(path: str, logic: ContestLogic, source: bytes) -> None:
+    """Pickle the logic with its indexes, tagged with the autosave bytes and the code it matches
+
+    The file is a JSON header line, the pickle and its signature on the last line.
+    """
+    if not SNAPSHOT_KEY:
+        return
+    header = json.dumps({"fingerprint": _fingerprint(), "source": _digest(source)}).encode()
+    body = pickle.dumps(logic, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + b"\n")
+        f.write(body)
+        f.write(b"\n" + _sign(header, body).encode())
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: str, source: bytes) -> Optional[ContestLogic]:
+    """Logic saved together with the autosave bytes source, None if missing, stale or incompatible
+
+    Nothing is unpickled unless the header matches this build and the signature verifies.
+    """
+    if not SNAPSHOT_KEY or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        header, rest = data.split(b"\n", 1)
+        body, signature = rest.rsplit(b"\n", 1)
+        meta = json.loads(header)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+
+    if not isinstance(meta, dict) or meta.get("fingerprint") != _fingerprint():
+        logger.info("Snapshot was written by a different build, ignoring it")
+        return None
+    if meta.get("source") != _digest(source):
+        logger.info("Snapshot is older than the autosave, ignoring it")
+        return None
+    if not hmac.compare_digest(signature, _sign(header, body).encode()):
+        logger.warning("Ignoring snapshot %s with a bad signature", path)
+        return None
+
+    try:
+        logic = pickle.loads(body)
+    except Exception as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    return logic if isinstance(logic, ContestLogic) else None
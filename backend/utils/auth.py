@@ -1,9 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader, APIKeyQuery
 from typing import Optional
+import os
 import secrets
 
-ADMIN_TOKEN = secrets.token_urlsafe(16)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") or secrets.token_urlsafe(16)
 
 api_key_header = APIKeyHeader(name="X-Admin-Token", auto_error=False)
 api_key_query = APIKeyQuery(name="admin_token", auto_error=False)
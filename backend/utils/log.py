@@ -0,0 +1,136 @@
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text") # "text" or "json"
+RATE_LIMIT_WINDOW = 60 # seconds during which a repeated message is logged once
+
+# Pass as extra= to log a repeating message at most once per window
+RATE_LIMITED = {"rate_limit": True}
+
+# Correlation id of the poll cycle (or other unit of work) being logged
+cycle_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("cycle_id", default=None)
+_cycle_counter = itertools.count(1)
+
+_listener: Optional[QueueListener] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"graphway.{name}")
+
+
+def new_cycle() -> int:
+    """Start a new correlation id for the current task"""
+    cid = next(_cycle_counter)
+    cycle_id.set(cid)
+    return cid
+
+
+class _ContextFilter(logging.Filter):
+    """Attach the correlation id while still on the calling task"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.cycle_id = cycle_id.get()
+        return True
+
+
+class _RateLimitFilter(logging.Filter):
+    """Drop repeats of the same opted-in message template within the window"""
+
+    def __init__(self, window: float = RATE_LIMIT_WINDOW):
+        super().__init__()
+        self.window = window
+        self.seen = dict() # (logger, template) -> [last emitted, suppressed count]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "rate_limit", False):
+            record.suppressed = 0
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        entry = self.seen.get(key)
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            return False
+        record.suppressed = entry[1] if entry else 0
+        self.seen[key] = [now, 0]
+        return True
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Enqueue records without formatting them on the event loop"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread; callers pass immutable args
+        return record
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = (f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')} {record.levelname:<7} "
+                f"{record.name.removeprefix('graphway.')}")
+        if record.cycle_id is not None:
+            line += f" [cycle={record.cycle_id}]"
+        line += f" {record.getMessage()}"
+        if record.suppressed:
+            line += f" (repeated {record.suppressed} more times)"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.cycle_id is not None:
+            data["cycle"] = record.cycle_id
+        if record.suppressed:
+            data["suppressed"] = record.suppressed
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Route graphway.* loggers through a queue drained by a background thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(_JSONFormatter() if fmt == "json" else _TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _LazyQueueHandler(log_queue)
+    handler.addFilter(_ContextFilter())
+    handler.addFilter(_RateLimitFilter())
+
+    root = logging.getLogger("graphway")
+    root.setLevel(level)
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -201,7 +201,7 @@ export default function AdminConfig() {
                                     type="file"
                                     ref={fileInputRef}
                                     style={{ display: 'none' }}
-                                    accept=".json"
+                                    accept=".json,.gz"
                                     onChange={handleFileChange}
                                 />
                                 <button onClick={handleImportClick} className="w-full flex items-center justify-center gap-2 bg-muted text-foreground px-4 py-4 rounded-md shadow hover:bg-muted/80 transition-colors border border-border">
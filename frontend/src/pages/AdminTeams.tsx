@@ -9,6 +9,11 @@ interface Team {
     access_code: string;
 }
 
+interface TeamPage {
+    teams: Team[];
+    next_cursor: string | null;
+}
+
 export default function AdminTeams() {
     const [teams, setTeams] = useState<Team[]>([]);
     const [name, setName] = useState("");
@@ -18,8 +23,17 @@ export default function AdminTeams() {
 
     const fetchTeams = async () => {
         try {
-            const res = await apiClient.get('/admin/teams');
-            setTeams(res.data);
+            // Only the listed columns, node sets are not needed here
+            const all: Team[] = [];
+            let cursor: string | null = null;
+            do {
+                const res: { data: TeamPage } = await apiClient.get('/admin/teams', {
+                    params: { fields: 'id,name,cf_handles,access_code', limit: 1000, ...(cursor ? { cursor } : {}) }
+                });
+                all.push(...res.data.teams);
+                cursor = res.data.next_cursor;
+            } while (cursor);
+            setTeams(all);
         } catch (e) {
             console.error(e);
         }
@@ -4,6 +4,8 @@ export interface Node {
     rating: number;
     position: [number, number];
     neighbors: string[];
+    unlock?: 'ANY' | 'ALL' | 'THRESHOLD';
+    unlock_count?: number;
     state?: 'locked' | 'available' | 'solved'; // For team view
 }
 
@@ -12,6 +14,7 @@ export interface ContestConfig {
     start_time: number;
     duration: number;
     state: 'EDITING' | 'RUNNING' | 'FINISHED';
+    scoring?: 'POSITION' | 'DEPTH';
 }
 
 export interface Team {
@@ -20,6 +23,7 @@ export interface Team {
     cf_handles: string[];
     solved: string[];
     available: string[];
+    solve_times?: Record<string, number>;
     access_code: string;
 }
 
@@ -29,6 +33,19 @@ export interface LeaderboardEntry {
     score: number;
 }
 
+export interface NodeStats {
+    id: string;
+    pid: string;
+    solved: number;
+    available: number;
+    first_solve: { team: string; time: number } | null;
+}
+
+export interface NodeStatsResponse {
+    teams: number;
+    nodes: NodeStats[];
+}
+
 export interface AdminGraphResponse {
     nodes: Node[];
 }
@@ -39,5 +56,33 @@ export interface TeamViewResponse {
     solved_count: number;
     score: number;
     nodes: Node[];
+    external?: ExternalNode[];
+    clusters?: NodeCluster[];
+    contest: ContestConfig;
+    version: string;
+    topology: string;
+}
+
+// Outside endpoint of an edge crossing a viewport query border
+export interface ExternalNode {
+    id: string;
+    position: [number, number];
+    neighbors: string[];
+}
+
+export interface NodeCluster {
+    position: [number, number];
+    count: number;
+    solved?: number;
+    available?: number;
+}
+
+export interface TeamStateResponse {
+    version: string;
+    topology: string;
+    solved_count: number;
+    score: number;
     contest: ContestConfig;
+    full: boolean;
+    nodes: Record<string, 'locked' | 'available' | 'solved'>;
 }